@@ -0,0 +1,222 @@
+"""Benchmarks of the rpi_gpio integration on simulated gpio chips.
+
+Runs Home Assistant in process with the simulator backend, so no hardware is
+needed, and writes a JSON report that can be compared across commits:
+
+    python benchmarks/bench_gpio.py --output before.json
+    python benchmarks/bench_gpio.py --output after.json --compare before.json
+
+Measured:
+  * throughput: edges per second from the chip through GPIODBinarySensor.handle_event
+    up to the state write, with one edge on every sensor per round
+  * latency: edge timestamp to state write percentiles, edges paced by a waveform thread
+  * setup: binary_sensor async_setup_platform time for 10, 100 and 500 lines
+  * memory: bytes allocated per configured binary_sensor line (tracemalloc)
+
+Every run uses fixed line counts, rounds and waveforms, results are the median
+of --repeat runs. Needs homeassistant and gpiod installed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOMAIN = "rpi_gpio"
+CHIP = "/dev/gpiochip0"
+SETUP_SIZES = (10, 100, 500)
+# simulated chip large enough for the biggest setup
+NUM_LINES = 512
+THROUGHPUT_LINES = 32
+THROUGHPUT_ROUNDS = 2000
+LATENCY_EDGES = 400
+LATENCY_PERIOD_MS = 5
+
+
+def sensors_config(count: int) -> dict:
+    return {
+        "platform": DOMAIN,
+        "sensors": [{"name": f"bench {port}", "port": port, "bouncetime": 0} for port in range(count)],
+    }
+
+
+async def start_hass(config_dir: str):
+    from homeassistant import bootstrap, core, loader
+
+    hass = core.HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    await bootstrap.async_from_config_dict({
+        "homeassistant": {},
+        DOMAIN: {"simulator": {"num_lines": NUM_LINES}},
+    }, hass)
+    await hass.async_block_till_done()
+    return hass
+
+
+async def setup_sensors(hass, count: int) -> float:
+    """Seconds spent setting up the binary_sensor platform with count lines"""
+    from homeassistant.setup import async_setup_component
+
+    start = time.perf_counter()
+    assert await async_setup_component(hass, "binary_sensor", {"binary_sensor": [sensors_config(count)]})
+    await hass.async_block_till_done()
+    elapsed = time.perf_counter() - start
+    assert len(hass.states.async_entity_ids("binary_sensor")) == count, "not every sensor was added"
+    return elapsed
+
+
+async def bench_setup(config_dir: str, count: int) -> float:
+    hass = await start_hass(config_dir)
+    try:
+        return await setup_sensors(hass, count)
+    finally:
+        await hass.async_stop()
+
+
+async def bench_memory(config_dir: str, count: int) -> float:
+    hass = await start_hass(config_dir)
+    try:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        await setup_sensors(hass, count)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        return allocated / count
+    finally:
+        await hass.async_stop()
+
+
+async def bench_events(config_dir: str) -> dict:
+    from homeassistant.const import EVENT_STATE_CHANGED
+
+    hass = await start_hass(config_dir)
+    try:
+        await setup_sensors(hass, THROUGHPUT_LINES)
+        hub = hass.data[DOMAIN]
+        chip = hub._backend.chips[CHIP]
+        ports = range(THROUGHPUT_LINES)
+        done = asyncio.Event()
+        pending = 0
+
+        def state_changed(event) -> None:
+            nonlocal pending
+            if event.data["entity_id"].startswith("binary_sensor.bench_"):
+                pending -= 1
+                if pending <= 0:
+                    done.set()
+
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, state_changed)
+        # sensors are pulled up, the first round brings every line low
+        start = time.perf_counter()
+        for round in range(THROUGHPUT_ROUNDS):
+            done.clear()
+            pending = len(ports)
+            level = bool(round % 2)
+            for port in ports:
+                chip.set_input(port, level)
+            await done.wait()
+        elapsed = time.perf_counter() - start
+        unsub()
+
+        # paced edges on one line, the loop is otherwise idle
+        hub.stats.latencies.clear()
+        edges = hub.stats.as_dict()["latency_samples"]
+        half = LATENCY_PERIOD_MS
+        chip.play(0, [(half, True), (half, False)], repeat=LATENCY_EDGES // 2)
+        await asyncio.sleep(LATENCY_EDGES * half / 1000 + 0.5)
+        chip.stop()
+        await hass.async_block_till_done()
+        latency = hub.stats.as_dict()
+        return {
+            "events_per_second": THROUGHPUT_ROUNDS * len(ports) / elapsed,
+            "latency_samples": latency["latency_samples"] - edges,
+            "latency_p50_ms": latency["latency_p50_ms"],
+            "latency_p99_ms": latency["latency_p99_ms"],
+            "latency_max_ms": latency["latency_max_ms"],
+            "dropped_events": sum(latency["dropped_events"].values()),
+        }
+    finally:
+        await hass.async_stop()
+
+
+def median(runs: list[dict]) -> dict:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(repeat: int) -> dict:
+    from homeassistant.const import __version__ as ha_version
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.mkdir(os.path.join(config_dir, "custom_components"))
+        os.symlink(os.path.join(ROOT, "custom_components", DOMAIN), os.path.join(config_dir, "custom_components", DOMAIN))
+
+        events = median([await bench_events(config_dir) for _ in range(repeat)])
+        setup = {
+            str(count): statistics.median([await bench_setup(config_dir, count) for _ in range(repeat)]) * 1000
+            for count in SETUP_SIZES
+        }
+        memory = await bench_memory(config_dir, SETUP_SIZES[-1])
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "homeassistant": ha_version,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": {
+            **{key: round(value, 3) for key, value in events.items()},
+            **{f"setup_{count}_lines_ms": round(value, 1) for count, value in setup.items()},
+            "memory_per_line_bytes": round(memory),
+        },
+    }
+
+
+def compare(report: dict, baseline: dict) -> None:
+    print(f"{'metric':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, value in report["results"].items():
+        old = baseline.get("results", {}).get(key)
+        change = f"{100 * (value - old) / old:+.1f}%" if old else ""
+        print(f"{key:<28}{'' if old is None else old:>14}{value:>14}{change:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the median is reported")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(run(args.repeat))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,107 @@
 import logging
 _LOGGER = logging.getLogger(__name__)
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.helpers.reload import async_reload_integration_platforms
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
 
-from .const import DOMAIN
-from .hub import Hub
+from .const import DOMAIN, CONF_CHIP, PLATFORMS
+from .hub import Hub, HISTORY_SIZE, RULE_ACTIONS
+from .history import dump
+from .sim import SimBackend
 
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
 
-from homeassistant.const import CONF_PATH
+from homeassistant.const import CONF_PATH, CONF_PORT, SERVICE_RELOAD
+
+ATTR_OUTPUTS = "outputs"
+ATTR_DURATION = "duration"
+ATTR_WIDTH = "width"
+ATTR_LEVEL = "level"
+ATTR_WAVEFORM = "waveform"
+ATTR_REPEAT = "repeat"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_FILE = "file"
+CONF_SIMULATOR = "simulator"
+CONF_NUM_LINES = "num_lines"
+CONF_HISTORY_SIZE = "history_size"
+CONF_RULES = "rules"
+CONF_INPUT = "input"
+CONF_OUTPUT = "output"
+CONF_ACTION = "action"
+CONF_EDGE = "edge"
+CONF_INTERLOCKS = "interlocks"
+CONF_PORTS = "ports"
+# longest pulse the pulse service accepts, in seconds
+MAX_PULSE = 60
+
+SET_OUTPUTS_SCHEMA = vol.Schema({
+    vol.Required(ATTR_OUTPUTS): {vol.Any(cv.positive_int, cv.string): cv.boolean},
+    vol.Optional(CONF_CHIP): cv.string,
+})
+
+PULSE_SCHEMA = vol.Schema({
+    vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+    vol.Required(ATTR_DURATION): vol.All(vol.Coerce(float), vol.Range(min=0, max=MAX_PULSE, min_included=False)),
+    vol.Optional(CONF_CHIP): cv.string,
+})
+
+GET_HISTORY_SCHEMA = vol.Schema({
+    vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+    vol.Optional(CONF_CHIP): cv.string,
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+    vol.Optional(ATTR_FILE): cv.string,
+})
+
+SIMULATE_INPUT_SCHEMA = vol.Schema({
+    vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+    vol.Exclusive(ATTR_LEVEL, ATTR_LEVEL): cv.boolean,
+    vol.Exclusive(ATTR_WAVEFORM, ATTR_LEVEL): [vol.ExactSequence([vol.Coerce(float), cv.boolean])],
+    vol.Optional(ATTR_REPEAT, default=1): cv.positive_int,
+    vol.Optional(CONF_CHIP): cv.string,
+})
+
+RULE_SCHEMA = vol.Schema({
+    vol.Required(CONF_INPUT): vol.Any(cv.positive_int, cv.string),
+    vol.Required(CONF_OUTPUT): vol.Any(cv.positive_int, cv.string),
+    vol.Required(CONF_ACTION): vol.In(RULE_ACTIONS),
+    vol.Optional(CONF_EDGE, default="RISING"): vol.In(["RISING", "FALLING"]),
+    vol.Optional(CONF_CHIP): cv.string,
+})
+
+# a port of an interlock, plain or with the chip it is on
+INTERLOCK_PORT_SCHEMA = vol.Any(
+    vol.All(vol.Any(cv.positive_int, cv.string), lambda port: {CONF_PORT: port}),
+    vol.Schema({
+        vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+        vol.Optional(CONF_CHIP): cv.string,
+    }),
+)
+
+# a list of ports, or ports with a chip for all of them
+INTERLOCK_SCHEMA = vol.Any(
+    vol.Schema({
+        vol.Required(CONF_PORTS): vol.All(cv.ensure_list, [INTERLOCK_PORT_SCHEMA], vol.Length(min=2)),
+        vol.Optional(CONF_CHIP): cv.string,
+    }),
+    vol.All(cv.ensure_list, [INTERLOCK_PORT_SCHEMA], vol.Length(min=2), lambda ports: {CONF_PORTS: ports}),
+)
 
 CONFIG_SCHEMA = vol.Schema(
     {
         DOMAIN: vol.Schema({
-            vol.Optional(CONF_PATH): vol.All(cv.string, vol.PathExists())
+            vol.Optional(CONF_PATH): vol.All(cv.string, vol.PathExists()),
+            vol.Optional(CONF_SIMULATOR, default=False): vol.Any(cv.boolean, vol.Schema({
+                vol.Optional(CONF_NUM_LINES, default=54): vol.All(cv.positive_int, vol.Range(min=1)),
+            })),
+            vol.Optional(CONF_HISTORY_SIZE, default=HISTORY_SIZE): vol.All(cv.positive_int, vol.Range(max=65536)),
+            vol.Optional(CONF_RULES, default=[]): vol.All(cv.ensure_list, [RULE_SCHEMA]),
+            vol.Optional(CONF_INTERLOCKS, default=[]): vol.All(cv.ensure_list, [INTERLOCK_SCHEMA]),
         })
     },
     extra=vol.ALLOW_EXTRA
@@ -28,8 +114,118 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     version = getattr(hass.data["integrations"][DOMAIN], "version", 0)
     _LOGGER.debug(f"{DOMAIN} integration starting. Version: {version}")
     path = config.get(DOMAIN, {}).get(CONF_PATH) 
-    hub = Hub(hass, path)
+    # simulated gpio chips, to try configurations without a Raspberry Pi
+    simulator = config.get(DOMAIN, {}).get(CONF_SIMULATOR)
+    backend = None
+    if isinstance(simulator, dict):
+        backend = SimBackend([SimBackend.pinctrl(num_lines=simulator[CONF_NUM_LINES])])
+    elif simulator:
+        backend = SimBackend()
+    hub = Hub(hass, path, backend, config.get(DOMAIN, {}).get(CONF_HISTORY_SIZE, HISTORY_SIZE))
+    await hub.async_open()
     hass.data[DOMAIN] = hub
 
+    # local rules, the platforms set up after this pick them up for their inputs and outputs
+    for rule in config.get(DOMAIN, {}).get(CONF_RULES, []):
+        try:
+            hub.add_rule(
+                hub.output_key(rule[CONF_INPUT], rule.get(CONF_CHIP)),
+                hub.output_key(rule[CONF_OUTPUT], rule.get(CONF_CHIP)),
+                rule[CONF_ACTION], rule[CONF_EDGE])
+        except HomeAssistantError as e:
+            _LOGGER.error(f"Failed to add rule {rule}: {e}")
+    for interlock in config.get(DOMAIN, {}).get(CONF_INTERLOCKS, []):
+        try:
+            hub.add_interlock([
+                hub.output_key(port[CONF_PORT], port.get(CONF_CHIP, interlock.get(CONF_CHIP)))
+                for port in interlock[CONF_PORTS]])
+        except HomeAssistantError as e:
+            _LOGGER.error(f"Failed to add interlock {interlock}: {e}")
+
+    async def async_get_diagnostics(call: ServiceCall) -> ServiceResponse:
+        return await hub.async_diagnostics()
+
+    hass.services.async_register(
+        DOMAIN, "get_diagnostics", async_get_diagnostics, supports_response=SupportsResponse.ONLY)
+
+    async def async_set_outputs(call: ServiceCall) -> None:
+        chip = call.data.get(CONF_CHIP)
+        try:
+            values = {hub.output_key(port, chip): value for port, value in call.data[ATTR_OUTPUTS].items()}
+        except HomeAssistantError as e:
+            raise ServiceValidationError(str(e)) from e
+        await hub.async_set_outputs(values)
+
+    hass.services.async_register(DOMAIN, "set_outputs", async_set_outputs, schema=SET_OUTPUTS_SCHEMA)
+
+    async def async_pulse(call: ServiceCall) -> ServiceResponse:
+        try:
+            key = hub.output_key(call.data[CONF_PORT], call.data.get(CONF_CHIP))
+        except HomeAssistantError as e:
+            raise ServiceValidationError(str(e)) from e
+        width = await hub.async_pulse_output(key, call.data[ATTR_DURATION])
+        return {ATTR_WIDTH: round(width, 6)}
+
+    hass.services.async_register(
+        DOMAIN, "pulse", async_pulse, schema=PULSE_SCHEMA, supports_response=SupportsResponse.OPTIONAL)
+
+    async def async_get_history(call: ServiceCall) -> ServiceResponse:
+        try:
+            key = hub.output_key(call.data[CONF_PORT], call.data.get(CONF_CHIP))
+        except HomeAssistantError as e:
+            raise ServiceValidationError(str(e)) from e
+        start, end = (
+            int(dt_util.as_utc(call.data[attr]).timestamp() * 1e9) if attr in call.data else None
+            for attr in (ATTR_START, ATTR_END))
+        history, events = hub.get_history(key, start, end)
+        response = {
+            CONF_CHIP: key[0],
+            CONF_PORT: key[1],
+            "recorded": history.total,
+            "events": [
+                {
+                    "timestamp": dt_util.utc_from_timestamp(timestamp / 1e9).isoformat(),
+                    "timestamp_ns": timestamp,
+                    "edge": "rising" if rising else "falling",
+                    "seqno": seqno,
+                }
+                for timestamp, rising, seqno in events
+            ],
+        }
+        if ATTR_FILE in call.data:
+            path = call.data[ATTR_FILE]
+            if not hass.config.is_allowed_path(path):
+                raise ServiceValidationError(f"{path} is not in allowlist_external_dirs")
+            await hass.async_add_executor_job(dump, path, key[1], events)
+            response[ATTR_FILE] = path
+        return response
+
+    hass.services.async_register(
+        DOMAIN, "get_history", async_get_history, schema=GET_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY)
+
+    async def async_reload(call: ServiceCall) -> None:
+        # lines of unchanged entities stay requested through the reload, outputs keep their level
+        hub.begin_reload()
+        try:
+            await async_reload_integration_platforms(hass, DOMAIN, PLATFORMS)
+        finally:
+            await hub.async_end_reload()
+
+    hass.services.async_register(DOMAIN, SERVICE_RELOAD, async_reload)
+
+    if backend:
+        async def async_simulate_input(call: ServiceCall) -> None:
+            try:
+                path, port = hub.output_key(call.data[CONF_PORT], call.data.get(CONF_CHIP))
+            except HomeAssistantError as e:
+                raise ServiceValidationError(str(e)) from e
+            chip = backend.chips[path]
+            if ATTR_WAVEFORM in call.data:
+                chip.play(port, call.data[ATTR_WAVEFORM], call.data[ATTR_REPEAT])
+            else:
+                chip.set_input(port, call.data.get(ATTR_LEVEL))
+
+        hass.services.async_register(DOMAIN, "simulate_input", async_simulate_input, schema=SIMULATE_INPUT_SCHEMA)
+
     return True
 
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import glob
+import gpiod
+
+
+class GpiodBackend:
+    """gpiochip character devices of the kernel through libgpiod.
+
+    A backend lists chip paths and opens them into objects with the gpiod.Chip
+    interface the hub uses: get_info, get_line_info, watch_line_info,
+    wait_info_event, read_info_event, request_lines, fd and close. The line
+    requests they return follow gpiod.LineRequest. See sim.SimBackend.
+    """
+
+    def chip_paths(self) -> list[str]:
+        return sorted(path for path in glob.glob("/dev/gpiochip*") if gpiod.is_gpiochip_device(path))
+
+    def open(self, path: str) -> gpiod.Chip:
+        return gpiod.Chip(path)
@@ -11,7 +11,10 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.const import CONF_SENSORS, CONF_NAME, CONF_PORT, CONF_UNIQUE_ID
+import homeassistant.util.dt as dt_util
 from .hub import BIAS
+from .debounce import FILTER_MODES
+from .const import CONF_CHIP
 
 CONF_INVERT_LOGIC = "invert_logic"
 DEFAULT_INVERT_LOGIC = False
@@ -19,6 +22,15 @@ CONF_BOUNCETIME = "bouncetime"
 DEFAULT_BOUNCETIME = 50
 CONF_PULL_MODE = "pull_mode"
 DEFAULT_PULL_MODE = "UP"
+CONF_COALESCE_TIME = "coalesce_time"
+DEFAULT_COALESCE_TIME = 0
+CONF_FILTER_MODE = "filter_mode"
+CONF_FILTER_TIME = "filter_time"
+DEFAULT_FILTER_TIME = 20
+CONF_FILTER_RELEASE_TIME = "filter_release_time"
+CONF_POLL_INTERVAL = "poll_interval"
+ATTR_COALESCED_EDGES = "coalesced_edges"
+ATTR_EDGE_TIMESTAMP = "edge_timestamp"
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
@@ -28,13 +40,21 @@ PLATFORM_SCHEMA = vol.All(
         vol.Exclusive(CONF_SENSORS, CONF_SENSORS): vol.All(
             cv.ensure_list, [{
                 vol.Required(CONF_NAME): cv.string,
-                vol.Required(CONF_PORT): cv.positive_int,
+                vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_CHIP): cv.string,
                 vol.Optional(CONF_PULL_MODE, default=DEFAULT_PULL_MODE): cv.string,
                 vol.Optional(CONF_BOUNCETIME, default=DEFAULT_BOUNCETIME): cv.positive_int,
                 vol.Optional(CONF_INVERT_LOGIC, default=DEFAULT_INVERT_LOGIC): cv.boolean,
+                vol.Optional(CONF_COALESCE_TIME): cv.positive_int,
+                vol.Optional(CONF_FILTER_MODE): vol.In(FILTER_MODES),
+                vol.Optional(CONF_FILTER_TIME, default=DEFAULT_FILTER_TIME): cv.positive_int,
+                vol.Optional(CONF_FILTER_RELEASE_TIME): cv.positive_int,
+                vol.Optional(CONF_POLL_INTERVAL): vol.All(cv.positive_int, vol.Range(min=10)),
                 vol.Optional(CONF_UNIQUE_ID): cv.string,
             }]
-        )
+        ),
+        vol.Optional(CONF_COALESCE_TIME, default=DEFAULT_COALESCE_TIME): cv.positive_int,
+        vol.Optional(CONF_POLL_INTERVAL): vol.All(cv.positive_int, vol.Range(min=10)),
     })
 )
 
@@ -53,51 +73,83 @@ async def async_setup_platform(
     sensors = []
     for sensor in config.get(CONF_SENSORS):
         try:
-            sensors.append(
-                GPIODBinarySensor(
-                    hub,
-                    sensor[CONF_NAME],
-                    sensor[CONF_PORT],
-                    sensor.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{sensor[CONF_PORT]}_{sensor[CONF_NAME].lower().replace(' ', '_')}",
-                    sensor.get(CONF_INVERT_LOGIC),
-                    sensor.get(CONF_PULL_MODE),
-                    sensor.get(CONF_BOUNCETIME)
-                )
-            )
+            chip, port = hub.resolve_line(sensor[CONF_PORT], sensor.get(CONF_CHIP))
+            await hub.async_claim_port(port, chip)
+            sensors.append((sensor, chip, port))
         except Exception as e:
             _LOGGER.error(f"Failed to add binary sensor {sensor[CONF_NAME]} for port {sensor[CONF_PORT]}: {e}")
 
-    async_add_entities(sensors)
+    lines = await hub.async_add_sensors(
+        (chip, port, sensor.get(CONF_INVERT_LOGIC), sensor.get(CONF_PULL_MODE), sensor.get(CONF_BOUNCETIME),
+         "BOTH", sensor.get(CONF_POLL_INTERVAL, config.get(CONF_POLL_INTERVAL)))
+        for sensor, chip, port in sensors)
+
+    entities = []
+    for sensor, chip, port in sensors:
+        if (chip, port) not in lines:
+            _LOGGER.error(f"Failed to add binary sensor {sensor[CONF_NAME]} for port {sensor[CONF_PORT]}: line request failed")
+            continue
+        line, current_is_on = lines[(chip, port)]
+        entities.append(
+            GPIODBinarySensor(
+                hub,
+                sensor[CONF_NAME],
+                port,
+                sensor.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{sensor[CONF_PORT]}_{sensor[CONF_NAME].lower().replace(' ', '_')}",
+                line,
+                current_is_on,
+                sensor.get(CONF_COALESCE_TIME, config[CONF_COALESCE_TIME]),
+                (sensor[CONF_FILTER_MODE], sensor[CONF_FILTER_TIME], sensor.get(CONF_FILTER_RELEASE_TIME))
+                if CONF_FILTER_MODE in sensor else None
+            )
+        )
+
+    async_add_entities(entities)
 
 
 class GPIODBinarySensor(BinarySensorEntity):
     _attr_should_poll = False
 
-    def __init__(self, hub, name, port, unique_id, active_low, bias, debounce):
-        _LOGGER.debug(f"GPIODBinarySensor init: {port} - {name} - {unique_id}")
+    _unrecorded_attributes = frozenset({ATTR_COALESCED_EDGES, ATTR_EDGE_TIMESTAMP})
+
+    def __init__(self, hub, name, port, unique_id, line, current_is_on, coalesce=0, glitch_filter=None):
+        _LOGGER.debug(f"GPIODBinarySensor init: {port} - {name} - {unique_id} - coalesce: {coalesce} - filter: {glitch_filter}")
         self._hub = hub
         self._attr_name = name
         self._attr_unique_id = unique_id
         self._port = port
-        self._active_low = active_low
-        self._bias = bias
-        self._debounce = debounce
-        self._line, current_is_on = self._hub.add_sensor(self._port, self._active_low, self._bias, self._debounce)
-        self._attr_is_on = current_is_on        
+        self._line = line
+        self._coalesce = coalesce
+        self._glitch_filter = glitch_filter
+        self._attr_is_on = current_is_on
+        self._attr_extra_state_attributes = {ATTR_EDGE_TIMESTAMP: None}
+        if coalesce:
+            self._attr_extra_state_attributes[ATTR_COALESCED_EDGES] = 0
+
+    @property
+    def available(self) -> bool:
+        return self._line.online
 
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
-        _LOGGER.debug(f"GPIODBinarySensor async_added_to_hass: Adding fd:{self._line.fd}")
-        self._hub._hass.loop.add_reader(self._line.fd, self.handle_event)
+        _LOGGER.debug(f"GPIODBinarySensor async_added_to_hass: port {self._port}")
+        self._hub.add_event_handler(self._line, self._port, self.handle_event, self._coalesce,
+                                    self._glitch_filter, self._attr_is_on)
+        self._line.listeners.append(self.async_write_ha_state)
 
     async def async_will_remove_from_hass(self) -> None:
         await super().async_will_remove_from_hass()
-        _LOGGER.debug(f"GPIODBinarySensor async_will_remove_from_hass: Removing fd:{self._line.fd}")
-        self._hub._hass.loop.remove_reader(self._line.fd)
-        self._line.release()
-
-    def handle_event(self):
-        for event in self._line.read_edge_events():
-            self._attr_is_on = True if event.event_type is event.Type.RISING_EDGE else False
-            _LOGGER.debug(f"Event: {event}. New line value: {self._attr_is_on}")
-        self.schedule_update_ha_state(False)
+        _LOGGER.debug(f"GPIODBinarySensor async_will_remove_from_hass: port {self._port}")
+        self._line.listeners.remove(self.async_write_ha_state)
+        await self._hub.async_release(self._line, self._port)
+
+    def handle_event(self, event, count):
+        self._attr_is_on = True if event.event_type is event.Type.RISING_EDGE else False
+        _LOGGER.debug("Event: %s. Edges: %s. New line value: %s", event, count, self._attr_is_on)
+        self._attr_extra_state_attributes = {ATTR_EDGE_TIMESTAMP: dt_util.utc_from_timestamp(event.timestamp_ns / 1e9).isoformat()}
+        if self._coalesce:
+            self._attr_extra_state_attributes[ATTR_COALESCED_EDGES] = count
+        # called from the hub reader on the event loop
+        self.async_write_ha_state()
+        if not self._coalesce and not self._glitch_filter:
+            self._hub.stats.record_latency(event)
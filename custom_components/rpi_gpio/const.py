@@ -1,4 +1,5 @@
 
 DOMAIN = "rpi_gpio"
 
-
+CONF_CHIP = "chip"
+PLATFORMS = ["binary_sensor", "cover", "fan", "light", "sensor", "switch"]
@@ -8,16 +8,22 @@ from time import sleep
 import logging
 _LOGGER = logging.getLogger(__name__)
 
-from homeassistant.core import HomeAssistant
+from datetime import timedelta
+import time
+
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
-from homeassistant.components.cover import CoverEntity
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.components.cover import CoverEntity, CoverEntityFeature
 from homeassistant.const import CONF_COVERS, CONF_NAME, CONF_UNIQUE_ID
+import homeassistant.util.dt as dt_util
 from .hub import BIAS, DRIVE
+from .debounce import FILTER_MODES
+from .const import CONF_CHIP
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
-import asyncio
 
 CONF_RELAY_PIN = "relay_pin"
 CONF_RELAY_TIME = "relay_time"
@@ -25,10 +31,26 @@ CONF_STATE_PIN = "state_pin"
 CONF_STATE_PULL_MODE = "state_pull_mode"
 CONF_INVERT_STATE = "invert_state"
 CONF_INVERT_RELAY = "invert_relay"
+CONF_COALESCE_TIME = "coalesce_time"
+CONF_STATE_BOUNCETIME = "state_bouncetime"
+CONF_STATE_FILTER_MODE = "state_filter_mode"
+CONF_STATE_FILTER_TIME = "state_filter_time"
+CONF_OPEN_PIN = "open_pin"
+CONF_TRAVEL_TIME = "travel_time"
+CONF_POSITION_INTERVAL = "position_interval"
 DEFAULT_RELAY_TIME = 0.2
 DEFAULT_STATE_PULL_MODE = "UP"
 DEFAULT_INVERT_STATE = False
 DEFAULT_INVERT_RELAY = False
+DEFAULT_COALESCE_TIME = 0
+DEFAULT_STATE_BOUNCETIME = 50
+DEFAULT_STATE_FILTER_TIME = 20
+DEFAULT_POSITION_INTERVAL = 1.0
+# a motion not ended by a limit pin after travel_time times this is considered stopped
+TRAVEL_TIMEOUT = 1.5
+OPENING = 1
+CLOSING = -1
+ATTR_EDGE_TIMESTAMP = "edge_timestamp"
 
 _COVERS_SCHEMA = vol.All(
     cv.ensure_list,
@@ -36,8 +58,11 @@ _COVERS_SCHEMA = vol.All(
         vol.Schema(
             {
                 CONF_NAME: cv.string,
-                CONF_RELAY_PIN: cv.positive_int,
-                CONF_STATE_PIN: cv.positive_int,
+                CONF_RELAY_PIN: vol.Any(cv.positive_int, cv.string),
+                CONF_STATE_PIN: vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_OPEN_PIN): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_TRAVEL_TIME): vol.All(vol.Coerce(float), vol.Range(min=1)),
+                vol.Optional(CONF_CHIP): cv.string,
                 vol.Optional(CONF_UNIQUE_ID): cv.string,
             }
         )
@@ -48,9 +73,14 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Required(CONF_COVERS): _COVERS_SCHEMA,
         vol.Optional(CONF_STATE_PULL_MODE, default=DEFAULT_STATE_PULL_MODE): cv.string,
-        vol.Optional(CONF_RELAY_TIME, default=DEFAULT_RELAY_TIME): cv.positive_int,
+        vol.Optional(CONF_RELAY_TIME, default=DEFAULT_RELAY_TIME): cv.positive_float,
         vol.Optional(CONF_INVERT_STATE, default=DEFAULT_INVERT_STATE): cv.boolean,
         vol.Optional(CONF_INVERT_RELAY, default=DEFAULT_INVERT_RELAY): cv.boolean,
+        vol.Optional(CONF_COALESCE_TIME, default=DEFAULT_COALESCE_TIME): cv.positive_int,
+        vol.Optional(CONF_STATE_BOUNCETIME, default=DEFAULT_STATE_BOUNCETIME): cv.positive_int,
+        vol.Optional(CONF_STATE_FILTER_MODE): vol.In(FILTER_MODES),
+        vol.Optional(CONF_STATE_FILTER_TIME, default=DEFAULT_STATE_FILTER_TIME): cv.positive_int,
+        vol.Optional(CONF_POSITION_INTERVAL, default=DEFAULT_POSITION_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
     }
 )
 
@@ -69,106 +99,288 @@ async def async_setup_platform(
     state_pull_mode = config[CONF_STATE_PULL_MODE]
     invert_state = config[CONF_INVERT_STATE]
     invert_relay = config[CONF_INVERT_RELAY]
+    coalesce_time = config[CONF_COALESCE_TIME]
+    state_bouncetime = config[CONF_STATE_BOUNCETIME]
+    glitch_filter = (config[CONF_STATE_FILTER_MODE], config[CONF_STATE_FILTER_TIME], None) \
+        if CONF_STATE_FILTER_MODE in config else None
     covers = []
     for cover in config.get(CONF_COVERS):
+        claimed = []
         try:
-            covers.append(
-                GPIODCover(
-                    hub,
-                    cover[CONF_NAME],
-                    cover.get(CONF_RELAY_PIN),
-                    relay_time,
-                    invert_relay,
-                    "AS_IS",
-                    "PUSH_PULL",
-                    cover.get(CONF_STATE_PIN),
-                    state_pull_mode,
-                    invert_state,
-                    cover.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{cover.get(CONF_RELAY_PIN)}_{cover[CONF_NAME].lower().replace(' ', '_')}",
-                )
-            )
+            # relay, state and the optional open limit pin, (None, None) when not configured
+            pins = [
+                hub.resolve_line(cover.get(pin), cover.get(CONF_CHIP)) if pin in cover else (None, None)
+                for pin in (CONF_RELAY_PIN, CONF_STATE_PIN, CONF_OPEN_PIN)]
+            for chip, port in pins:
+                if port is not None:
+                    await hub.async_claim_port(port, chip)
+                    claimed.append((chip, port))
         except Exception as e:
+            for chip, port in claimed:
+                hub.unclaim_port(port, chip)
             _LOGGER.error(f"Failed to add cover {cover[CONF_NAME]} for port {cover.get(CONF_RELAY_PIN)}:{cover.get(CONF_STATE_PIN)}: {e}")
+            continue
+        covers.append((cover, *pins))
+
+    relay_lines = await hub.async_add_switches(
+        (relay_chip, relay_port, invert_relay, "AS_IS", "PUSH_PULL", False)
+        for cover, (relay_chip, relay_port), state, limit in covers)
+    state_lines = await hub.async_add_sensors(
+        (chip, port, invert_state, state_pull_mode, state_bouncetime)
+        for cover, relay, state, limit in covers for chip, port in (state, limit) if port is not None)
+
+    tracker = MotionTracker(hass, config[CONF_POSITION_INTERVAL])
+    entities = []
+    for cover, (relay_chip, relay_port), (state_chip, state_port), (open_chip, open_port) in covers:
+        relay_line = relay_lines.get((relay_chip, relay_port))
+        state_line, current_is_on = state_lines.get((state_chip, state_port), (None, False))
+        open_line, open_is_on = state_lines.get((open_chip, open_port), (None, False))
+        if not relay_line or not state_line or (open_port is not None and not open_line):
+            _LOGGER.error(f"Failed to add cover {cover[CONF_NAME]} for port {cover.get(CONF_RELAY_PIN)}:{cover.get(CONF_STATE_PIN)}: line request failed")
+            for line, port in ((relay_line, relay_port), (state_line, state_port), (open_line, open_port)):
+                if line:
+                    await hub.async_release(line, port)
+            continue
+        entities.append(
+            GPIODCover(
+                hub,
+                cover[CONF_NAME],
+                relay_port,
+                relay_time,
+                relay_line,
+                state_port,
+                state_line,
+                current_is_on,
+                coalesce_time,
+                glitch_filter,
+                cover.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{cover.get(CONF_RELAY_PIN)}_{cover[CONF_NAME].lower().replace(' ', '_')}",
+                open_port,
+                open_line,
+                open_is_on,
+                cover.get(CONF_TRAVEL_TIME),
+                tracker,
+            )
+        )
+
+    async_add_entities(entities)
 
-    async_add_entities(covers)
+
+class MotionTracker:
+    """One timer moving the estimated position of all moving covers of a platform"""
+
+    def __init__(self, hass, interval):
+        self._hass = hass
+        self._interval = timedelta(seconds=interval)
+        self._covers = set()
+        self._unsub = None
+
+    def add(self, cover):
+        self._covers.add(cover)
+        if not self._unsub:
+            self._unsub = async_track_time_interval(self._hass, self._async_update, self._interval)
+
+    def remove(self, cover):
+        self._covers.discard(cover)
+        if not self._covers and self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_update(self, now):
+        now_ns = time.time_ns()
+        for cover in list(self._covers):
+            cover.update_position(now_ns)
 
 class GPIODCover(CoverEntity):
+    """Cover with a relay and a closed limit pin.
+
+    With an open limit pin the position is known at both ends. With travel_time
+    the position in between is estimated from when the motion started, the edge
+    timestamp of a limit pin released or the relay pulse, and is_opening /
+    is_closing last until a limit pin is reached or the travel time is over.
+    """
     _attr_should_poll = False
+    _attr_supported_features = CoverEntityFeature.OPEN | CoverEntityFeature.CLOSE | CoverEntityFeature.STOP
+    _unrecorded_attributes = frozenset({ATTR_EDGE_TIMESTAMP})
 
-    def __init__(self, hub, name, relay_port, relay_time, relay_active_low, relay_bias, relay_drive,
-                 state_port, state_bias, state_active_low, unique_id):
-        _LOGGER.debug(f"GPIODCover init: {relay_port}:{state_port} - {name} - {unique_id} - {relay_time}")
+    def __init__(self, hub, name, relay_port, relay_time, relay_line,
+                 state_port, state_line, current_is_on, coalesce, glitch_filter, unique_id,
+                 open_port=None, open_line=None, open_is_on=False, travel_time=None, tracker=None):
+        _LOGGER.debug(f"GPIODCover init: {relay_port}:{state_port} - {name} - {unique_id} - {relay_time} - open_port: {open_port} - travel_time: {travel_time}")
         self._hub = hub
         self._attr_name = name
         self._attr_unique_id = unique_id
         self._relay_port = relay_port
         self._relay_time = relay_time
-        self._relay_active_low = relay_active_low
-        self._relay_bias = relay_bias
-        self._relay_drive = relay_drive
+        self._relay_line = relay_line
         self._state_port = state_port
-        self._state_bias = state_bias
-        self._state_active_low = state_active_low
-        self._relay_line, self._state_line, current_is_on = self._hub.add_cover(
-            self._relay_port, self._relay_active_low, self._relay_bias, self._relay_drive,
-            self._state_port, self._state_bias, self._state_active_low)        
+        self._state_line = state_line
+        self._coalesce = coalesce
+        self._glitch_filter = glitch_filter
         self._attr_is_closed = current_is_on
         self.is_on = current_is_on
+        self._attr_extra_state_attributes = {ATTR_EDGE_TIMESTAMP: None}
+        self._open_port = open_port
+        self._open_line = open_line
+        self._travel_ns = int(travel_time * 1e9) if travel_time else None
+        self._tracker = tracker
+        # (direction, start REALTIME ns, start position) while moving with a travel time
+        self._motion = None
+        self._tracked = bool(open_line or travel_time)
+        if self._tracked:
+            self._attr_current_cover_position = 0 if current_is_on else 100 if open_is_on else None
+
+    @property
+    def _lines(self) -> set:
+        return {line for line in (self._relay_line, self._state_line, self._open_line) if line}
+
+    @property
+    def available(self) -> bool:
+        return all(line.online for line in self._lines)
 
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
-        _LOGGER.debug(f"GPIODCover async_added_to_hass: Adding fd:{self._state_line.fd}")
-        self._hub._hass.loop.add_reader(self._state_line.fd, self.handle_event)
+        _LOGGER.debug(f"GPIODCover async_added_to_hass: state port {self._state_port}")
+        self._hub.add_event_handler(self._state_line, self._state_port, self.handle_event, self._coalesce,
+                                    self._glitch_filter, self._attr_is_closed)
+        if self._open_line:
+            self._hub.add_event_handler(self._open_line, self._open_port, self.handle_open_event, self._coalesce,
+                                        self._glitch_filter, self._attr_current_cover_position == 100)
+        for line in self._lines:
+            line.listeners.append(self.async_write_ha_state)
 
     async def async_will_remove_from_hass(self) -> None:
         await super().async_will_remove_from_hass()
-        _LOGGER.debug(f"GPIODCover async_will_remove_from_hass: Removing fd:{self._state_line.fd}")
-        self._hub._hass.loop.remove_reader(self._state_line.fd)
-        self._relay_line.release()
-        self._state_line.release()
+        _LOGGER.debug(f"GPIODCover async_will_remove_from_hass: state port {self._state_port}")
+        if self._tracker:
+            self._tracker.remove(self)
+        for line in self._lines:
+            line.listeners.remove(self.async_write_ha_state)
+        await self._hub.async_release(self._relay_line, self._relay_port)
+        await self._hub.async_release(self._state_line, self._state_port)
+        if self._open_line:
+            await self._hub.async_release(self._open_line, self._open_port)
+
+    def handle_event(self, event, count):
+        self._attr_is_closed = True if event.event_type is event.Type.RISING_EDGE else False
+        _LOGGER.debug("Event: %s. Edges: %s. New _attr_is_closed value: %s", event, count, self._attr_is_closed)
+        self._attr_extra_state_attributes = {ATTR_EDGE_TIMESTAMP: dt_util.utc_from_timestamp(event.timestamp_ns / 1e9).isoformat()}
+        if self._attr_is_closed:
+            if self._tracked:
+                self._end_motion(0)
+        elif self._travel_ns and not self.is_opening:
+            # left the closed position, e.g. opened by a remote, the motion started at the edge
+            self._start_motion(OPENING, event.timestamp_ns, 0)
+        elif self._tracked and not self._travel_ns:
+            # between the limits, no estimate without a travel time
+            self._attr_current_cover_position = None
+        # called from the hub reader on the event loop
+        self.async_write_ha_state()
+        if not self._coalesce and not self._glitch_filter:
+            self._hub.stats.record_latency(event)
 
-    def handle_event(self):
-        for event in self._state_line.read_edge_events():
-            self._attr_is_closed = True if event.event_type is event.Type.RISING_EDGE else False
-            _LOGGER.debug(f"Event: {event}. New _attr_is_closed value: {self._attr_is_closed}")
-        self.schedule_update_ha_state(False)
+    def handle_open_event(self, event, count):
+        is_open = event.event_type is event.Type.RISING_EDGE
+        _LOGGER.debug("Open limit event: %s. Edges: %s. Open: %s", event, count, is_open)
+        self._attr_extra_state_attributes = {ATTR_EDGE_TIMESTAMP: dt_util.utc_from_timestamp(event.timestamp_ns / 1e9).isoformat()}
+        if is_open:
+            self._end_motion(100)
+        elif self._travel_ns and not self.is_closing:
+            self._start_motion(CLOSING, event.timestamp_ns, 100)
+        elif not self._travel_ns:
+            # between the limits, no estimate without a travel time
+            self._attr_current_cover_position = None
+        self.async_write_ha_state()
+        if not self._coalesce and not self._glitch_filter:
+            self._hub.stats.record_latency(event)
+
+    def _estimate(self, now_ns) -> float:
+        direction, start_ns, start = self._motion
+        return start + direction * 100 * (now_ns - start_ns) / self._travel_ns
+
+    def _start_motion(self, direction, start_ns, position) -> None:
+        self._motion = (direction, start_ns, position)
+        self._attr_is_opening = direction == OPENING
+        self._attr_is_closing = direction == CLOSING
+        self._tracker.add(self)
+
+    def _end_motion(self, position) -> None:
+        self._motion = None
+        self._attr_is_opening = False
+        self._attr_is_closing = False
+        self._attr_current_cover_position = position
+        if self._tracker:
+            self._tracker.remove(self)
+
+    def update_position(self, now_ns) -> None:
+        """Called by the shared timer while moving"""
+        if not self._motion:
+            return
+        direction, start_ns, _ = self._motion
+        position = self._estimate(now_ns)
+        if 0 < position < 100:
+            self._attr_current_cover_position = round(min(max(position, 1), 99))
+        elif direction == OPENING and not self._open_line:
+            # no open limit pin, open once the travel time is over
+            self._end_motion(100)
+        elif now_ns - start_ns > self._travel_ns * TRAVEL_TIMEOUT:
+            # the limit pin was never reached, stopped short of it
+            _LOGGER.debug(f"GPIODCover {self.name}: limit not reached after {TRAVEL_TIMEOUT} x travel time")
+            self._end_motion(self._attr_current_cover_position)
+        else:
+            # wait for the limit pin
+            self._attr_current_cover_position = 99 if direction == OPENING else 1
+        self.async_write_ha_state()
 
     async def async_close_cover(self, **kwargs):
-        _LOGGER.debug(f"GPIODCover async_close_cover: is_closed: {self.is_closed}. is_closing: {self.is_closing}, is_opening: {self.is_opening}")
-        if self.is_closed:
+        _LOGGER.debug("GPIODCover async_close_cover: is_closed: %s. is_closing: %s, is_opening: %s", self.is_closed, self.is_closing, self.is_opening)
+        if self.is_closed or (self._travel_ns and self.is_closing):
             return
-        self._hub.turn_on(self._relay_line, self._relay_port)
+        if self._travel_ns:
+            self._start_motion(CLOSING, time.time_ns(), self._current_position(100))
         self._attr_is_closing = True
         self.async_write_ha_state()
-        await asyncio.sleep(self._relay_time)
-        if not self.is_closing:
-            # closing stopped
+        # timed on the hub pulse thread, the relay time does not depend on the event loop load
+        await self._hub.async_pulse(self._relay_line, self._relay_port, self._relay_time)
+        if not self.is_closing or self._travel_ns:
+            # closing stopped, or it lasts until the travel model ends it
             return
-        self._hub.turn_off(self._relay_line, self._relay_port)
         self._attr_is_closing = False
         self.async_write_ha_state()
 
     async def async_open_cover(self, **kwargs):
-        _LOGGER.debug(f"GPIODCover async_open_cover: is_closed: {self.is_closed}. is_closing: {self.is_closing}, is_opening: {self.is_opening}")
-        if not self.is_closed:
+        _LOGGER.debug("GPIODCover async_open_cover: is_closed: %s. is_closing: %s, is_opening: %s", self.is_closed, self.is_closing, self.is_opening)
+        if self._travel_ns:
+            if self.is_opening or self._attr_current_cover_position == 100:
+                return
+            self._start_motion(OPENING, time.time_ns(), self._current_position(0))
+        elif not self.is_closed:
             return
-        self._hub.turn_on(self._relay_line, self._relay_port)
         self._attr_is_opening = True
         self.async_write_ha_state()
-        await asyncio.sleep(self._relay_time)
-        if not self.is_opening:
-            # opening stopped
+        await self._hub.async_pulse(self._relay_line, self._relay_port, self._relay_time)
+        if not self.is_opening or self._travel_ns:
+            # opening stopped, or it lasts until the travel model ends it
             return
-        self._hub.turn_off(self._relay_line, self._relay_port)
         self._attr_is_opening = False
         self.async_write_ha_state()
 
     async def async_stop_cover(self, **kwargs):
-        _LOGGER.debug(f"GPIODCover async_stop_cover: is_closed: {self.is_closed}. is_closing: {self.is_closing}, is_opening: {self.is_opening}")
+        _LOGGER.debug("GPIODCover async_stop_cover: is_closed: %s. is_closing: %s, is_opening: %s", self.is_closed, self.is_closing, self.is_opening)
         if not (self.is_closing or self.is_opening):
             return
-        self._hub.turn_off(self._relay_line, self._relay_port)
+        await self._hub.async_turn_off(self._relay_line, self._relay_port)
+        if self._motion:
+            self._end_motion(round(min(max(self._estimate(time.time_ns()), 1), 99)))
         self._attr_is_opening = False
         self._attr_is_closing = False
         self.async_write_ha_state()
 
+    def _current_position(self, default) -> float:
+        """Where a new motion starts, default when the position is unknown"""
+        if self._motion:
+            return min(max(self._estimate(time.time_ns()), 0), 100)
+        if self._attr_current_cover_position is None:
+            return default
+        return self._attr_current_cover_position
+
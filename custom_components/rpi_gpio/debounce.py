@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from homeassistant.core import HomeAssistant
+
+from typing import Callable, Dict
+import time
+import gpiod
+
+EventType = gpiod.EdgeEvent.Type
+
+FILTER_STABLE = "stable"
+FILTER_MAJORITY = "majority"
+FILTER_HYSTERESIS = "hysteresis"
+FILTER_MODES = [FILTER_STABLE, FILTER_MAJORITY, FILTER_HYSTERESIS]
+
+# wheel resolution, filter deadlines fire at most this late
+WHEEL_TICK_MS = 5
+# slots per rotation, longer deadlines stay in their slot for another round
+WHEEL_SLOTS = 512
+
+
+class TimerWheel:
+    """Hashed timer wheel, a single loop timer serves the deadlines of all filters.
+
+    Deadlines are kernel REALTIME edge timestamps plus the filter time, so a
+    batch of events read late is settled from when the edges really happened.
+    """
+
+    def __init__(self, hass: HomeAssistant, tick_ms: int = WHEEL_TICK_MS, slots: int = WHEEL_SLOTS) -> None:
+        self._loop = hass.loop
+        self._tick = tick_ms * 1_000_000
+        self._slots = [set() for _ in range(slots)]
+        self._size = 0
+        self._last = 0
+        self._timer = None
+
+    def schedule(self, item, deadline_ns: int) -> None:
+        """(Re)schedule item, item.expire() is called once deadline_ns has passed"""
+        self.cancel(item)
+        if not self._timer:
+            self._last = time.time_ns() // self._tick
+            self._timer = self._loop.call_later(self._tick / 1e9, self._advance)
+        # a deadline already past fires on the next tick
+        slot = max(deadline_ns // self._tick, self._last + 1) % len(self._slots)
+        self._slots[slot].add(item)
+        item.slot = slot
+        item.deadline = deadline_ns
+        self._size += 1
+
+    def cancel(self, item) -> None:
+        if item.slot is None:
+            return
+        self._slots[item.slot].discard(item)
+        item.slot = None
+        item.deadline = 0
+        self._size -= 1
+
+    def _advance(self) -> None:
+        now = time.time_ns()
+        current = now // self._tick
+        for tick in range(self._last + 1, min(current, self._last + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for item in [item for item in slot if item.deadline <= now]:
+                self.cancel(item)
+                item.expire()
+        # the current tick may still hold deadlines later in it, visit its slot again next time
+        self._last = current - 1
+        self._timer = self._loop.call_later(self._tick / 1e9, self._advance) if self._size else None
+
+    def stop(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+
+class EdgeFilter:
+    """Userspace glitch filter of one input, between the hub reader and the entity handler.
+
+    stable: a new level is reported once it held for time ms.
+    hysteresis: like stable, with release_time ms to settle on inactive.
+    majority: the first edge opens a window of time ms, the level held longest in it wins.
+
+    handler(event, count) gets the last edge to the settled level and the number
+    of edges folded into it, so bounces never reach the state machine.
+    """
+
+    def __init__(self, wheel: TimerWheel, handler: Callable, mode: str, time_ms: int,
+                 release_ms: int | None = None, level: bool = False) -> None:
+        self._wheel = wheel
+        self._handler = handler
+        self._mode = mode
+        self._time = time_ms * 1_000_000
+        self._release = (release_ms if mode == FILTER_HYSTERESIS and release_ms is not None else time_ms) * 1_000_000
+        self.level = level
+        self.reported = level
+        # wheel bookkeeping
+        self.slot = None
+        self.deadline = 0
+        self._count = 0
+        self._events: Dict[bool, object] = {}
+        # majority window: its end, nanoseconds active so far and time of the last edge
+        self._window_end = 0
+        self._active = 0
+        self._since = 0
+
+    def feed(self, event) -> None:
+        """Called by the hub reader for every edge of the port"""
+        timestamp = event.timestamp_ns
+        if self.deadline and timestamp >= self.deadline:
+            # read late, the pending deadline passed before this edge happened
+            self._wheel.cancel(self)
+            self.expire()
+        level = event.event_type is EventType.RISING_EDGE
+        self._count += 1
+        self._events[level] = event
+        if self._mode == FILTER_MAJORITY:
+            if not self.deadline:
+                self._active = 0
+                self._window_end = timestamp + self._time
+                self._wheel.schedule(self, self._window_end)
+            elif self.level:
+                self._active += timestamp - self._since
+            self._since = timestamp
+            self.level = level
+            return
+        self.level = level
+        if level == self.reported:
+            # bounced back before settling
+            self._wheel.cancel(self)
+        else:
+            self._wheel.schedule(self, timestamp + (self._time if level else self._release))
+
+    def expire(self) -> None:
+        """Deadline passed, report the settled level if it changed"""
+        level = self.level
+        if self._mode == FILTER_MAJORITY:
+            active = self._active + (self._window_end - self._since if self.level else 0)
+            level = self.reported if active * 2 == self._time else active * 2 > self._time
+        if level == self.reported:
+            return
+        self.reported = level
+        event, count = self._events[level], self._count
+        self._count = 0
+        self._handler(event, count)
+
+    def reset(self, level: bool) -> None:
+        """Start over from a level read from the line, e.g. after edges were missed"""
+        self._wheel.cancel(self)
+        self.level = self.reported = level
+        self._count = 0
+
+    def cancel(self) -> None:
+        self._wheel.cancel(self)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import Any
+
+from . import DOMAIN
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
+from homeassistant.components.fan import FanEntity, FanEntityFeature
+from homeassistant.const import CONF_NAME, CONF_PORT, CONF_UNIQUE_ID
+from .hub import DRIVE
+from .const import CONF_CHIP
+CONF_FANS = "fans"
+CONF_INVERT_LOGIC = "invert_logic"
+DEFAULT_INVERT_LOGIC = False
+CONF_DRIVE = "drive"
+DEFAULT_DRIVE = "PUSH_PULL"
+CONF_FREQUENCY = "frequency"
+DEFAULT_FREQUENCY = 100
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+
+FREQUENCY = vol.All(vol.Coerce(float), vol.Range(min=1, max=2000))
+
+PLATFORM_SCHEMA = vol.All(
+    PLATFORM_SCHEMA.extend({
+        vol.Exclusive(CONF_FANS, CONF_FANS): vol.All(
+            cv.ensure_list, [{
+                vol.Required(CONF_NAME): cv.string,
+                vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_CHIP): cv.string,
+                vol.Optional(CONF_UNIQUE_ID): cv.string,
+                vol.Optional(CONF_INVERT_LOGIC, default=DEFAULT_INVERT_LOGIC): cv.boolean,
+                vol.Optional(CONF_DRIVE, default=DEFAULT_DRIVE): vol.In(DRIVE.keys()),
+                vol.Optional(CONF_FREQUENCY): FREQUENCY,
+            }]
+        ),
+        vol.Optional(CONF_FREQUENCY, default=DEFAULT_FREQUENCY): FREQUENCY,
+    })
+)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None) -> None:
+
+    _LOGGER.debug(f"setup_platform: {config}")
+    hub = hass.data[DOMAIN]
+    if not hub._online:
+        _LOGGER.error("hub not online, bailing out")
+
+    fans = []
+    for fan in config.get(CONF_FANS):
+        try:
+            chip, port = hub.resolve_line(fan[CONF_PORT], fan.get(CONF_CHIP))
+            await hub.async_claim_port(port, chip)
+            fans.append((fan, chip, port))
+        except Exception as e:
+            _LOGGER.error(f"Failed to add fan {fan[CONF_NAME]} for port {fan[CONF_PORT]}: {e}")
+
+    lines = await hub.async_add_switches(
+        (chip, port, fan.get(CONF_INVERT_LOGIC), "AS_IS", fan.get(CONF_DRIVE), False)
+        for fan, chip, port in fans)
+
+    entities = []
+    for fan, chip, port in fans:
+        if (chip, port) not in lines:
+            _LOGGER.error(f"Failed to add fan {fan[CONF_NAME]} for port {fan[CONF_PORT]}: line request failed")
+            continue
+        entities.append(
+            GPIODFan(
+                hub,
+                fan[CONF_NAME],
+                port,
+                fan.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{fan[CONF_PORT]}_{fan[CONF_NAME].lower().replace(' ', '_')}",
+                lines[(chip, port)],
+                fan.get(CONF_FREQUENCY, config[CONF_FREQUENCY])
+            )
+        )
+
+    async_add_entities(entities)
+
+
+class GPIODFan(FanEntity):
+    """Fan speed set by the software PWM duty cycle"""
+    _attr_should_poll = False
+    _attr_supported_features = FanEntityFeature.SET_SPEED | FanEntityFeature.TURN_ON | FanEntityFeature.TURN_OFF
+
+    def __init__(self, hub, name, port, unique_id, line, frequency):
+        _LOGGER.debug(f"GPIODFan init: {port} - {name} - {unique_id} - frequency: {frequency}")
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._port = port
+        self._line = line
+        self._frequency = frequency
+        self._channel = None
+        self._attr_percentage = 0
+        self._last_percentage = 100
+
+    @property
+    def available(self) -> bool:
+        return self._line.online
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._channel = self._hub.pwm.add(self._line, self._port, self._frequency)
+        self._line.listeners.append(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        _LOGGER.debug(f"GPIODFan async_will_remove_from_hass: port {self._port}")
+        self._line.listeners.remove(self.async_write_ha_state)
+        self._hub.pwm.remove(self._channel)
+        if self._line.online:
+            await self._hub.async_turn_off(self._line, self._port)
+        await self._hub.async_release(self._line, self._port)
+
+    async def async_set_percentage(self, percentage: int) -> None:
+        if percentage:
+            self._last_percentage = percentage
+        self._attr_percentage = percentage
+        self._hub.pwm.set_duty(self._channel, percentage / 100)
+        self.async_write_ha_state()
+
+    async def async_turn_on(self, percentage: int | None = None, preset_mode: str | None = None, **kwargs: Any) -> None:
+        await self.async_set_percentage(percentage or self._last_percentage)
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        await self.async_set_percentage(0)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from array import array
+import struct
+
+# dump file: header of magic, version, port, record count, then the records oldest first
+DUMP_MAGIC = b"RPGH"
+DUMP_VERSION = 1
+DUMP_HEADER = struct.Struct("<4sBxHI")
+# timestamp ns (REALTIME), line seqno, edge (1 rising, 0 falling)
+DUMP_RECORD = struct.Struct("<qIB")
+
+
+class EdgeHistory:
+    """Ring of the last edges of one input, preallocated so recording an edge never allocates.
+
+    Edges are kept as (timestamp_ns, rising, seqno) in three flat arrays, the
+    oldest is overwritten once size edges are recorded. Polled level changes
+    are recorded with seqno 0.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._timestamps = array("q", bytes(8 * size))
+        self._seqnos = array("Q", bytes(8 * size))
+        self._edges = bytearray(size)
+        self._next = 0
+        # edges recorded since startup, including the overwritten ones
+        self.total = 0
+
+    def append(self, timestamp_ns: int, rising: bool, seqno: int) -> None:
+        index = self._next
+        self._timestamps[index] = timestamp_ns
+        self._seqnos[index] = seqno
+        self._edges[index] = rising
+        self._next = index + 1 if index + 1 < self.size else 0
+        self.total += 1
+
+    def __len__(self) -> int:
+        return min(self.total, self.size)
+
+    def events(self, start_ns: int | None = None, end_ns: int | None = None) -> list[tuple[int, bool, int]]:
+        """Recorded edges with start_ns <= timestamp <= end_ns, oldest first"""
+        count = len(self)
+        first = (self._next - count) % self.size
+        events = []
+        for n in range(count):
+            index = (first + n) % self.size
+            timestamp = self._timestamps[index]
+            if start_ns is not None and timestamp < start_ns:
+                continue
+            if end_ns is not None and timestamp > end_ns:
+                continue
+            events.append((timestamp, bool(self._edges[index]), self._seqnos[index]))
+        return events
+
+
+def dump(path: str, port: int, events: list[tuple[int, bool, int]]) -> None:
+    """Write events to a compact binary file, 13 bytes per edge, see DUMP_HEADER and DUMP_RECORD"""
+    with open(path, "wb") as file:
+        file.write(DUMP_HEADER.pack(DUMP_MAGIC, DUMP_VERSION, port, len(events)))
+        for timestamp, rising, seqno in events:
+            file.write(DUMP_RECORD.pack(timestamp, seqno & 0xFFFFFFFF, rising))
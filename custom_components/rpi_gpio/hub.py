@@ -6,16 +6,43 @@ import logging
 _LOGGER = logging.getLogger(__name__)
 
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP, EVENT_HOMEASSISTANT_START
 from homeassistant.exceptions import HomeAssistantError,ServiceValidationError
 
-from typing import Dict
+from typing import Callable, Dict
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+import asyncio
+import errno
+import os
+import time
 import gpiod
 
+from .backend import GpiodBackend
+from .debounce import EdgeFilter, TimerWheel
+from .history import EdgeHistory
+from .pulse import Pulse, PulseScheduler
+from .pwm import PwmScheduler
 from gpiod.line import Direction, Value, Bias, Drive, Edge, Clock
 EventType = gpiod.EdgeEvent.Type
 
+# max edge events pulled from the kernel per read on a shared input request
+EDGE_EVENT_BATCH = 256
+# rolling window of edge to state latencies used for percentiles
+LATENCY_SAMPLES = 1000
+# poll interval (ms) of inputs whose chip rejects edge detection
+POLL_FALLBACK_INTERVAL = 100
+# edges kept per input for get_history, 0 disables the history
+HISTORY_SIZE = 256
+# seconds before the first attempt to reopen a lost chip, doubled per failed attempt up to the max
+RECOVERY_DELAY = 1
+RECOVERY_MAX_DELAY = 30
+# errors of an output ioctl meaning the chip is gone or was reset, not a bad request
+CHIP_LOST_ERRORS = {errno.ENODEV, errno.ENXIO, errno.EIO, errno.ESHUTDOWN}
+
 BIAS = { 
     "UP": Bias.PULL_UP, 
     "DOWN": Bias.PULL_DOWN,
@@ -27,19 +54,452 @@ DRIVE = {
     "OPEN_SOURCE": Drive.OPEN_SOURCE, 
     "PUSH_PULL": Drive.PUSH_PULL, 
 } 
+EDGE = {
+    "RISING": Edge.RISING,
+    "FALLING": Edge.FALLING,
+    "BOTH": Edge.BOTH,
+}
+# output rules, see Hub.add_rule
+RULE_FOLLOW = "follow"
+RULE_INVERT = "invert"
+RULE_TOGGLE = "toggle"
+RULE_ACTIONS = [RULE_FOLLOW, RULE_INVERT, RULE_TOGGLE]
+
+def output_settings(active_low, bias, drive_mode) -> gpiod.LineSettings:
+    return gpiod.LineSettings(
+        direction = Direction.OUTPUT,
+        bias = BIAS[bias],
+        drive = DRIVE[drive_mode],
+        active_low = active_low)
+
+def input_settings(active_low, bias, debounce, edge) -> gpiod.LineSettings:
+    return gpiod.LineSettings(
+        direction = Direction.INPUT,
+        edge_detection = EDGE[edge] if edge else Edge.NONE,
+        bias = BIAS[bias],
+        active_low = active_low,
+        debounce_period = timedelta(milliseconds=debounce),
+        event_clock = Clock.REALTIME)
+
+# removed port held in a request of outputs, an input without bias or edge detection
+INERT_SETTINGS = gpiod.LineSettings(direction=Direction.INPUT)
+
+class GpioChip:
+    """A gpiochip device with its cached line info table and its own GPIO thread"""
+
+    def __init__(self, path: str, chip: gpiod.Chip, info: gpiod.ChipInfo) -> None:
+        self.path = path
+        self.chip = chip
+        self.info = info
+        self.line_info: Dict[int, gpiod.LineInfo] = {}
+        self.line_names: Dict[str, int] = {}
+        # created on first use, every ioctl of this chip runs on it so a slow
+        # expander never blocks the event loop or the other chips
+        self.executor: ThreadPoolExecutor | None = None
+        # line requests of this chip, requested again when it comes back after a loss
+        self.lines: set[LineGroup] = set()
+        # the device dropped off or reset, chip has to be reopened, see Hub.chip_lost
+        self.lost = False
+        self.recovery: asyncio.Task | None = None
+
+    @property
+    def name(self) -> str:
+        return self.info.name
+
+    @property
+    def label(self) -> str:
+        return self.info.label
+
+    def __repr__(self) -> str:
+        return f"GpioChip({self.path}, {self.label})"
+
+    async def async_run(self, hass: HomeAssistant, func, *args):
+        return await hass.loop.run_in_executor(self.executor, func, *args)
+
+    def read_line_names(self) -> None:
+        for offset in range(self.info.num_lines):
+            name = self.chip.get_line_info(offset).name
+            if name:
+                self.line_names.setdefault(name, offset)
+
+    def watch_lines(self) -> None:
+        """Build the line info table once, info events keep it current afterwards"""
+        for offset in range(self.info.num_lines):
+            self.line_info[offset] = self.chip.watch_line_info(offset)
+        _LOGGER.debug(f"watching {len(self.line_info)} lines of {self.path}")
+
+    def handle_info_events(self) -> None:
+        """Line requested / released / reconfigured, by us or by another process"""
+        while self.chip.wait_info_event(0):
+            event = self.chip.read_info_event()
+            _LOGGER.debug("Info event on %s: %s", self.path, event)
+            self.line_info[event.line_info.offset] = event.line_info
+
+
+class LineGroup:
+    """Ports of one chip sharing a single gpiod LineRequest"""
+
+    def __init__(self, chip: GpioChip, request: gpiod.LineRequest, config: dict) -> None:
+        self.chip = chip
+        self.request = request
+        # port -> settings of every line of the request, needed to reconfigure a single one
+        self.settings: Dict[int, gpiod.LineSettings] = {
+            port: settings for group, settings in config.items() for port in group}
+        self.ports = set(self.settings)
+        # released ports kept inert in the request, so its outputs are never released, see Hub.shrink
+        self.held: set[int] = set()
+        # port -> last value driven on an output
+        self.values: Dict[int, bool] = {}
+        # port -> edge event handler, the reader of this request dispatches through it
+        self.handlers: Dict[int, Callable] = {}
+        # port -> userspace glitch filter fed with every edge before its handler
+        self.filters: Dict[int, EdgeFilter] = {}
+        # port -> poll interval (ms) of inputs requested without edge detection
+        self.poll: Dict[int, int] = {}
+        # port -> edge reported by a polled port that fell back from edge detection, default both
+        self.poll_edges: Dict[int, Edge] = {}
+        # port -> edge history of inputs, owned by the hub and kept over a reload
+        self.history: Dict[int, EdgeHistory] = {}
+        # port -> [last event, count] of the read in progress, reused by every read of the reader
+        self.batch: Dict[int, list] = {}
+        # ports with events in the read in progress
+        self.pending: list[int] = []
+        # False while the chip is lost, the request is stale until it is requested again
+        self.online = True
+        # called on the loop when online changes, entities write their availability
+        self.listeners: list[Callable] = []
+
+    def config(self) -> dict:
+        """Settings of all lines for reconfigure_lines, outputs keep their current value"""
+        return {
+            port: replace(settings, output_value=Value.ACTIVE if self.values.get(port) else Value.INACTIVE)
+            if settings.direction == Direction.OUTPUT else settings
+            for port, settings in self.settings.items()
+        }
+
+    @property
+    def fd(self) -> int:
+        return self.request.fd
+
+    def __repr__(self) -> str:
+        return f"LineGroup({self.chip.path}, ports={sorted(self.ports)}, request={self.request})"
+
+
+def open_fds() -> int | None:
+    """File descriptors of the process, line requests and chips hold one each"""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class EventStats:
+    """Edge delivery statistics and per port counters, cheap enough to update for every event"""
+
+    def __init__(self) -> None:
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.seqno: Dict[tuple, int] = {}
+        self.dropped: Dict[tuple, int] = {}
+        # (chip name, port) -> events received, edges and polled level changes
+        self.events: Dict[tuple, int] = {}
+        # (chip name, port) -> [calls, total ns, max ns] of event handlers and of output ioctls
+        self.handler_time: Dict[tuple, list] = {}
+        self.set_value_time: Dict[tuple, list] = {}
+
+    def track(self, chip: str, event) -> None:
+        """Count the event, and events lost to kernel buffer overflow from line_seqno gaps"""
+        port = (chip, event.line_offset)
+        self.events[port] = self.events.get(port, 0) + 1
+        last = self.seqno.get(port)
+        if last is not None and event.line_seqno > last + 1:
+            self.dropped[port] = self.dropped.get(port, 0) + event.line_seqno - last - 1
+        self.seqno[port] = event.line_seqno
+
+    def count(self, chip: str, port: int) -> None:
+        self.events[(chip, port)] = self.events.get((chip, port), 0) + 1
+
+    @staticmethod
+    def record_time(table: Dict[tuple, list], chip: str, port: int, elapsed_ns: int) -> None:
+        entry = table.get((chip, port))
+        if entry is None:
+            table[(chip, port)] = [1, elapsed_ns, elapsed_ns]
+            return
+        entry[0] += 1
+        entry[1] += elapsed_ns
+        if elapsed_ns > entry[2]:
+            entry[2] = elapsed_ns
+
+    def record_latency(self, event) -> None:
+        """Time from the kernel REALTIME edge timestamp until now, call after the state write.
+
+        Only for edges handled as soon as they are read: polled, coalesced and filtered
+        edges are late on purpose and would hide the delivery latency.
+        """
+        if type(event) is not PolledEvent:
+            self.latencies.append(time.time_ns() - event.timestamp_ns)
+
+    def forget(self, chip: str, port: int) -> None:
+        """line_seqno restarts with a new request, the counters are kept"""
+        self.seqno.pop((chip, port), None)
+
+    def lines(self) -> dict:
+        """Counters per port, the hot pins of the setup without debug logging"""
+        lines: Dict[tuple, dict] = {}
+        for port, count in list(self.events.items()):
+            lines.setdefault(port, {})["events"] = count
+        for port, count in list(self.dropped.items()):
+            lines.setdefault(port, {})["dropped"] = count
+        for name, table in (("handler", self.handler_time), ("set_value", self.set_value_time)):
+            for port, (calls, total, longest) in list(table.items()):
+                lines.setdefault(port, {}).update({
+                    f"{name}_calls": calls,
+                    f"{name}_avg_us": round(total / calls / 1e3, 1),
+                    f"{name}_max_us": round(longest / 1e3, 1),
+                })
+        return {f"{chip}:{port}": counters for (chip, port), counters in sorted(lines.items())}
+
+    def totals(self) -> dict:
+        handler = list(self.handler_time.values())
+        set_value = list(self.set_value_time.values())
+        return {
+            "events": sum(self.events.values()),
+            "dropped_events": sum(self.dropped.values()),
+            "handler_max_us": round(max((entry[2] for entry in handler), default=0) / 1e3, 1),
+            "set_value_max_us": round(max((entry[2] for entry in set_value), default=0) / 1e3, 1),
+        }
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(latencies[int(q * (len(latencies) - 1))] / 1e6, 3) if latencies else None
+
+        return {
+            "latency_samples": len(latencies),
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+            "latency_max_ms": percentile(1),
+            "dropped_events": {f"{chip}:{port}": count for (chip, port), count in self.dropped.items()},
+        }
+
+
+class PolledEvent:
+    """Level change found by the poller, passed to handlers in place of a gpiod EdgeEvent"""
+    Type = EventType
+
+    def __init__(self, event_type, timestamp_ns: int, line_offset: int) -> None:
+        self.event_type = event_type
+        self.timestamp_ns = timestamp_ns
+        self.line_offset = line_offset
+        self.line_seqno = 0
+
+    def __repr__(self) -> str:
+        return f"PolledEvent({self.line_offset}, {self.event_type}, {self.timestamp_ns})"
+
+
+class Poller:
+    """Sample inputs without edge detection, one timer for all of them.
+
+    Every tick the due ports are read with one get_values per line request on the
+    thread of its chip, and only ports whose level differs from the last snapshot
+    are dispatched.
+    """
+
+    def __init__(self, hass: HomeAssistant, hub: Hub) -> None:
+        self._hass = hass
+        self._hub = hub
+        # (LineGroup, port) -> [interval ns, next due monotonic ns, last level, edge reported]
+        self._ports: Dict[tuple, list] = {}
+        self._interval = None
+        self._unsub = None
+        self._busy = False
+
+    def add(self, line: LineGroup, port: int, level: bool) -> None:
+        interval = line.poll[port] * 1_000_000
+        self._ports[(line, port)] = [interval, time.monotonic_ns() + interval, level, line.poll_edges.get(port, Edge.BOTH)]
+        self._reschedule()
+
+    def remove(self, line: LineGroup, port: int) -> None:
+        if self._ports.pop((line, port), None):
+            self._reschedule()
+
+    def _reschedule(self) -> None:
+        interval = min((entry[0] for entry in self._ports.values()), default=None)
+        if interval == self._interval:
+            return
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+        self._interval = interval
+        if interval:
+            _LOGGER.debug(f"polling {len(self._ports)} ports every {interval / 1e6} ms")
+            self._unsub = async_track_time_interval(
+                self._hass, self._async_poll, timedelta(microseconds=interval // 1000))
+
+    def stop(self) -> None:
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    async def _async_poll(self, now) -> None:
+        if self._busy:
+            # the previous round is still waiting for a slow chip
+            return
+        self._busy = True
+        try:
+            now_ns = time.monotonic_ns()
+            tick = now_ns + self._interval // 2
+            batches: Dict[LineGroup, list] = {}
+            for (line, port), entry in self._ports.items():
+                if entry[1] <= tick and line.online:
+                    entry[1] = max(entry[1] + entry[0], now_ns)
+                    batches.setdefault(line, []).append(port)
+            results = await asyncio.gather(
+                *(line.chip.async_run(self._hass, line.request.get_values, ports) for line, ports in batches.items()),
+                return_exceptions=True)
+            timestamp = time.time_ns()
+            for (line, ports), values in zip(batches.items(), results):
+                if isinstance(values, Exception):
+                    _LOGGER.debug("Polling %s failed: %s", line, values)
+                    if isinstance(values, OSError) and values.errno in CHIP_LOST_ERRORS and line.online:
+                        self._hub.chip_lost(line.chip, values)
+                    continue
+                for port, value in zip(ports, values):
+                    entry = self._ports.get((line, port))
+                    level = value == Value.ACTIVE
+                    if entry is None or entry[2] == level:
+                        continue
+                    entry[2] = level
+                    if entry[3] is not Edge.BOTH and level != (entry[3] is Edge.RISING):
+                        # e.g. a pulse counter of rising edges
+                        continue
+                    self._hub.dispatch(line, port, PolledEvent(
+                        EventType.RISING_EDGE if level else EventType.FALLING_EDGE, timestamp, port))
+        finally:
+            self._busy = False
+
+
+class Coalescer:
+    """Fold edge bursts of one port into at most one handler call per window"""
+
+    def __init__(self, hass: HomeAssistant, handler: Callable, window: int) -> None:
+        self._hass = hass
+        self._handler = handler
+        self._window = window / 1000
+        self._event = None
+        self._count = 0
+        self._timer = None
+
+    def __call__(self, event, count: int) -> None:
+        if self._timer:
+            self._event = event
+            self._count += count
+            return
+        # quiet line, report the leading edge right away and open a window
+        self._handler(event, count)
+        self._timer = self._hass.loop.call_later(self._window, self._flush)
+
+    def _flush(self) -> None:
+        self._timer = None
+        if not self._count:
+            return
+        event, count = self._event, self._count
+        self._event = None
+        self._count = 0
+        self._handler(event, count)
+        self._timer = self._hass.loop.call_later(self._window, self._flush)
+
+    def cancel(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+
+class RuleHandler:
+    """Apply the output rules of an input port, then call the entity handler.
+
+    Behind a glitch filter every call is one settled transition, the edges folded
+    into it are bounces and do not drive the outputs.
+    """
+
+    def __init__(self, hub: Hub, rules: list, handler: Callable, settled: bool = False) -> None:
+        self.hub = hub
+        self.rules = rules
+        self.handler = handler
+        self.settled = settled
+
+    def __call__(self, event, count: int) -> None:
+        rising = event.event_type is EventType.RISING_EDGE
+        edges = 1 if self.settled else count
+        for output, action, edge in self.rules:
+            self.hub.apply_rule(output, action, edge, rising, edges)
+        self.handler(event, count)
+
 
 class Hub:
 
-    def __init__(self, hass: HomeAssistant, path: str) -> None:
-        """GPIOD Hub"""
+    def __init__(self, hass: HomeAssistant, path: str, backend=None, history_size: int = HISTORY_SIZE) -> None:
+        """GPIOD Hub, backend defaults to the kernel gpiochip devices, see sim.SimBackend"""
 
+        self._backend = backend or GpiodBackend()
         self._path = path
-        self._chip :  gpiod.Chip
+        self._chip :  GpioChip
+        self._chips: Dict[str, GpioChip] = {}
+        # kernel line name -> (chip path, offset), built once at discovery
+        self._line_names: Dict[str, tuple[str, int]] = {}
         self._name = path
         self._id = path
         self._hass = hass
         self._online = False
+        self._ports = set()
+        # (chip path, port) -> (LineGroup, state callback) of output entities
+        self._outputs: Dict[tuple, tuple[LineGroup, Callable]] = {}
+        # (chip path, port) -> LineGroup of entities removed during a reload, still requested
+        self._parked: Dict[tuple, LineGroup] = {}
+        self._reloading = False
+        self.stats = EventStats()
+        # (chip name, port) -> {"count", "last_ms", "max_error_ms"} of measured pulses
+        self.pulses: Dict[tuple, dict] = {}
+        # publisher of the diagnostic sensors, a single set per hub, see sensor.py
+        self.diagnostic_sensors = None
+        self.pulser = PulseScheduler(self.begin_pulse, self.end_pulse)
+        self.pwm = PwmScheduler()
+        self.wheel = TimerWheel(hass)
+        self.poller = Poller(hass, self)
+        self.history_size = history_size
+        # (chip path, port) -> edge history of every input seen since startup
+        self.history: Dict[tuple, EdgeHistory] = {}
+        # (chip path, input port) -> [(output key, action, edge)], see add_rule
+        self._rules: Dict[tuple, list] = {}
+        # (chip path, output port) -> keys of the outputs driven inactive before it goes active
+        self._interlocks: Dict[tuple, list] = {}
 
+    async def async_open(self) -> None:
+        """Discover gpiochips and open the configured or discovered default chip"""
+        await self._hass.async_add_executor_job(self.open)
+        self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+        self.activate(self._chip)
+
+    async def _async_stop(self, event) -> None:
+        self.wheel.stop()
+        self.pwm.stop()
+        self.poller.stop()
+        self.pulser.stop()
+        for chip in self._chips.values():
+            if chip.recovery:
+                chip.recovery.cancel()
+            if chip.executor:
+                if not chip.lost:
+                    # a lost chip was closed by its recovery
+                    self._hass.loop.remove_reader(chip.chip.fd)
+                    await chip.async_run(self._hass, chip.chip.close)
+                chip.executor.shutdown(wait=False)
+            else:
+                chip.chip.close()
+
+    def open(self) -> None:
+        self.discover_chips()
+        path = self._path
         if path:
             # use config
             _LOGGER.debug(f"trying to use configured device: {path}")
@@ -58,31 +518,239 @@ class Hub:
                     break
 
         self.verify_online()
+        self._chip = self._chips[self._path]
         _LOGGER.debug(f"using gpio_device: {self._path}")
 
+    def discover_chips(self) -> None:
+        """Open every gpiochip once, expanders and HATs show up as extra devices"""
+        for path in self._backend.chip_paths():
+            chip = self._backend.open(path)
+            try:
+                info = chip.get_info()
+            except Exception as e:
+                _LOGGER.warning(f"discover_chips: failed to read {path}: {e}")
+                chip.close()
+                continue
+            _LOGGER.debug(f"discover_chips: {path} info is: {info}")
+            gpio_chip = GpioChip(path, chip, info)
+            try:
+                gpio_chip.read_line_names()
+            except Exception as e:
+                _LOGGER.warning(f"discover_chips: failed to read line names of {path}: {e}")
+            for name, offset in gpio_chip.line_names.items():
+                if self._line_names.setdefault(name, (path, offset)) != (path, offset):
+                    _LOGGER.debug(f"discover_chips: line name {name} of {path} already used by {self._line_names[name][0]}")
+            self._chips[path] = gpio_chip
+
+    def activate(self, chip: GpioChip) -> None:
+        """Start the GPIO thread and line info watching of chip on first use"""
+        if chip.executor:
+            return
+        _LOGGER.debug(f"activating {chip}")
+        chip.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{DOMAIN}_{chip.name}")
+
+        def watched(future):
+            if future.exception():
+                _LOGGER.error(f"Failed to watch lines of {chip.path}: {future.exception()}")
+
+        # queued first on the chip thread, so it is done before any claim of this chip
+        chip.executor.submit(chip.watch_lines).add_done_callback(watched)
+        self._hass.loop.add_reader(chip.chip.fd, self.handle_info_events, chip)
+
+    def handle_info_events(self, chip: GpioChip) -> None:
+        try:
+            chip.handle_info_events()
+        except OSError as e:
+            # the chip fd turns readable with an error once the device is gone
+            self.chip_lost(chip, e)
+
+    def chip_lost(self, chip: GpioChip, error: Exception) -> None:
+        """Take the lines of a chip that is gone or was reset offline and start recovering it.
+
+        The readers of the chip and its requests are removed, entities of the lines
+        turn unavailable until the recovery requested them again.
+        """
+        if not chip.lost:
+            _LOGGER.error(f"Lost {chip.path}: {error}, reopening it")
+            self._hass.loop.remove_reader(chip.chip.fd)
+            chip.lost = True
+        # the set belongs to the GPIO thread
+        for line in list(chip.lines):
+            if line.online:
+                if line.handlers:
+                    self._hass.loop.remove_reader(line.fd)
+                self.take_offline(line)
+        self.recover_chip(chip)
+
+    def take_offline(self, line: LineGroup) -> None:
+        """Mark line offline, its reader is already removed"""
+        line.online = False
+        for listener in line.listeners:
+            listener()
+
+    def recover_chip(self, chip: GpioChip) -> None:
+        """Start requesting the offline lines of chip again, reopening it first when it is lost"""
+        if not chip.recovery:
+            chip.recovery = self._hass.async_create_background_task(
+                self._async_recover(chip), f"{DOMAIN} recover {chip.path}")
+
+    async def _async_recover(self, chip: GpioChip) -> None:
+        """Retry with backoff until the chip is open and all its lines are requested again"""
+        delay = RECOVERY_DELAY
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    reopened, lines = await chip.async_run(self._hass, self.recover, chip)
+                except Exception as e:
+                    _LOGGER.warning(f"Reopening {chip.path} failed: {e}")
+                else:
+                    self.resume(chip, reopened, lines)
+                    if not chip.lost and all(line.online for line in list(chip.lines)):
+                        _LOGGER.warning(f"{chip.path} recovered, {len(chip.lines)} line requests restored")
+                        return
+                delay = min(delay * 2, RECOVERY_MAX_DELAY)
+                _LOGGER.debug(f"retrying {chip.path} in {delay}s")
+        finally:
+            chip.recovery = None
+
+    def recover(self, chip: GpioChip) -> tuple[bool, list]:
+        """Reopen a lost chip and request its offline lines again, on the GPIO thread of the chip.
+
+        Outputs are requested with their last values. Lines taken meanwhile, e.g. by
+        another process, stay offline for the next attempt.
+        Returns (reopened, [(LineGroup, {port: current level})]) of the lines requested.
+        """
+        reopened = chip.lost
+        if chip.lost:
+            for line in chip.lines:
+                try:
+                    line.request.release()
+                except Exception:
+                    pass
+            try:
+                chip.chip.close()
+            except Exception:
+                pass
+            gpiod_chip = self._backend.open(chip.path)
+            try:
+                info = gpiod_chip.get_info()
+                if info.label != chip.label:
+                    raise HomeAssistantError(f"{chip.path} is now {info.label}, expected {chip.label}")
+                chip.chip = gpiod_chip
+                chip.watch_lines()
+            except Exception:
+                gpiod_chip.close()
+                raise
+            chip.lost = False
+        lines = []
+        for line in chip.lines:
+            if line.online:
+                continue
+            ports = sorted(line.ports)
+            try:
+                line.request = chip.chip.request_lines(
+                    consumer=DOMAIN,
+                    config={port: settings for port, settings in line.config().items() if port in line.ports})
+                levels = line.request.get_values(ports)
+            except Exception as e:
+                consumers = {chip.line_info[port].consumer for port in ports if port in chip.line_info and chip.line_info[port].used}
+                _LOGGER.warning(f"Failed to request ports {ports} of {chip.path} again: {e}, in use by {consumers or 'nobody'}")
+                continue
+            lines.append((line, {port: value == Value.ACTIVE for port, value in zip(ports, levels)}))
+        return reopened, lines
+
+    def resume(self, chip: GpioChip, reopened: bool, lines: list) -> None:
+        """Put the lines requested again by recover back online, on the loop"""
+        if chip.lost:
+            # lost again while recovering, the next attempt starts over
+            return
+        if reopened:
+            self._hass.loop.add_reader(chip.chip.fd, self.handle_info_events, chip)
+        timestamp = time.time_ns()
+        for line, levels in lines:
+            line.online = True
+            if line.handlers:
+                self._hass.loop.add_reader(line.fd, self.handle_events, line)
+            for port, level in levels.items():
+                # the new request counts its seqnos from 1
+                self.stats.forget(chip.name, port)
+                if port in line.handlers and line.settings[port].edge_detection == Edge.BOTH:
+                    self.resync(line, port, level, timestamp)
+            for listener in line.listeners:
+                listener()
+
+    def resync(self, line: LineGroup, port: int, level: bool, timestamp_ns: int) -> None:
+        """Hand an input its current level, its edges while the chip was lost are missed.
+
+        Rules are skipped, their outputs were requested again with their last values.
+        """
+        handler = line.handlers[port]
+        if isinstance(handler, RuleHandler):
+            handler = handler.handler
+        if port in line.filters:
+            line.filters[port].reset(level)
+        handler(PolledEvent(EventType.RISING_EDGE if level else EventType.FALLING_EDGE, timestamp_ns, port), 1)
+
+    def resolve_chip(self, chip: str | None = None) -> GpioChip:
+        """Find a chip by path, name or label, None is the default chip"""
+        if chip is None:
+            return self._chip
+        if chip in self._chips:
+            return self._chips[chip]
+        for gpio_chip in self._chips.values():
+            if chip in (gpio_chip.name, gpio_chip.label):
+                return gpio_chip
+        raise HomeAssistantError(f"gpio chip {chip} not found, available: {[c.label for c in self._chips.values()]}")
+
+    def resolve_line(self, port: int | str, chip: str | None = None) -> tuple[str | None, int]:
+        """Map a configured port, an offset or a kernel line name like GPIO17, to (chip, offset)"""
+        if isinstance(port, int):
+            return chip, port
+        if chip is not None:
+            gpio_chip = self.resolve_chip(chip)
+            if port in gpio_chip.line_names:
+                return chip, gpio_chip.line_names[port]
+            raise HomeAssistantError(f"Line {port} not found on {gpio_chip.path}")
+        if port in self._line_names:
+            return self._line_names[port]
+        raise HomeAssistantError(f"Line {port} not found on any gpio chip")
+
+    async def _async_chip(self, chip: str | None = None) -> GpioChip:
+        gpio_chip = self.resolve_chip(chip)
+        self.activate(gpio_chip)
+        return gpio_chip
+
     def verify_online(self):
         if not self._online:
             _LOGGER.error("No gpio device detected, bailing out")
             raise HomeAssistantError("No gpio device detected")
 
+    def verify_line(self, line: LineGroup) -> None:
+        if not line.online:
+            raise HomeAssistantError(f"{line.chip.path} is offline, waiting for it to come back")
+
     def verify_gpiochip(self, path, require_pinctrl=True):
-        if not gpiod.is_gpiochip_device(path):
+        chip = self._chips.get(path)
+        if not chip:
             _LOGGER.debug(f"verify_gpiochip: {path} not a gpiochip_device")
             return False
 
-        _LOGGER.debug(f"verify_gpiochip: {path} is a gpiochip_device")
-        self._chip = gpiod.Chip(path)
-        info = self._chip.get_info()
-        _LOGGER.debug(f"verify_gpiochip: {path} info is: {info}")
-        if require_pinctrl and not "pinctrl" in info.label:
-            _LOGGER.debug(f"verify_gpiochip: {path} no pinctrl {info.label}")
+        _LOGGER.debug(f"verify_gpiochip: {path} is a gpiochip_device {chip.label}")
+        if require_pinctrl and not "pinctrl" in chip.label:
+            _LOGGER.debug(f"verify_gpiochip: {path} no pinctrl {chip.label}")
             return False
 
         _LOGGER.debug(f"verify_gpiochip gpiodevice: {path}")
         return True
 
-    def verify_port_ready(self, port: int):
-        info = self._chip.get_line_info(port)
+    def verify_port_ready(self, port: int, chip: str | None = None):
+        gpio_chip = self.resolve_chip(chip)
+        if (gpio_chip.path, port) in self._ports:
+            raise HomeAssistantError(f"Port {port} already in use by another entity, check your config for duplicates port usage")
+        info = gpio_chip.line_info.get(port)
+        if info is None:
+            raise HomeAssistantError(f"Port {port} does not exist on {gpio_chip.path}, it has {gpio_chip.info.num_lines} lines")
         _LOGGER.debug(f"original port {port} info: {info}")
         if info.used:
             if info.consumer != DOMAIN:
@@ -90,60 +758,680 @@ class Hub:
             else:
                 raise HomeAssistantError(f"Port {port} already in use by another entity, check your config for duplicates port usage")
 
+    def claim_port(self, port: int, chip: str | None = None):
+        """Verify port is free and reserve it for a following add_switches / add_sensors batch"""
+        self.verify_online()
+        gpio_chip = self.resolve_chip(chip)
+        line = next((line for line in gpio_chip.lines if port in line.held), None)
+        if line:
+            # held inert since its entity was removed, taken over like a parked port
+            line.held.discard(port)
+            line.ports.add(port)
+            self._ports.add((gpio_chip.path, port))
+            self._parked[(gpio_chip.path, port)] = line
+        if (gpio_chip.path, port) in self._parked:
+            # still requested from before the reload, the next batch takes it over
+            return
+        self.verify_port_ready(port, chip)
+        self._ports.add((self.resolve_chip(chip).path, port))
+
+    def unclaim_port(self, port: int, chip: str | None = None):
+        """Drop a reservation made by claim_port that was never requested"""
+        key = (self.resolve_chip(chip).path, port)
+        if key not in self._parked:
+            self._ports.discard(key)
+
+    def release(self, line: LineGroup, port: int) -> None:
+        """Release port, the shared request is released once its last port is gone,
+        otherwise it keeps the line until shrink requests the remaining ports again"""
+        _LOGGER.debug(f"release port {port} from {line}")
+        self.remove_event_handler(line, port)
+        self.remove_output(line, port)
+        if self._reloading:
+            # keep the line driven as is, the reloaded config most likely wants it again
+            self._parked[(line.chip.path, port)] = line
+            return
+        self.stats.forget(line.chip.name, port)
+        self._ports.discard((line.chip.path, port))
+        line.ports.discard(port)
+        if not line.ports:
+            line.chip.lines.discard(line)
+            line.held.clear()
+            if line.online:
+                line.request.release()
+
+    def begin_reload(self) -> None:
+        """Park the lines of entities removed by a reload instead of releasing them"""
+        self._reloading = True
+
+    async def async_end_reload(self) -> None:
+        """Release the parked lines the reloaded config did not take over"""
+        self._reloading = False
+        parked, self._parked = self._parked, {}
+        for (path, port), line in parked.items():
+            _LOGGER.debug(f"port {port} of {path} removed from config")
+            await line.chip.async_run(self._hass, self.release, line, port)
+        for line in set(parked.values()):
+            await self._async_shrink(line)
+
+    def reuse_parked(self, gpio_chip: GpioChip, port: int, settings: gpiod.LineSettings, value: bool | None = None) -> LineGroup | None:
+        """Take over a parked line, reconfigured in place only when its settings changed.
+
+        value is the initial value of a line that was not an output before.
+        """
+        key = (gpio_chip.path, port)
+        line = self._parked.pop(key)
+        if line.settings[port] == settings:
+            _LOGGER.debug(f"reuse port {port} of {line} unchanged")
+            return line
+        previous = line.settings[port]
+        line.settings[port] = settings
+        if settings.direction == Direction.OUTPUT:
+            line.values.setdefault(port, bool(value))
+        try:
+            line.request.reconfigure_lines(line.config())
+        except Exception as e:
+            _LOGGER.error(f"Failed to reconfigure port {port} on {gpio_chip.path}: {e}")
+            line.settings[port] = previous
+            self._parked[key] = line
+            return None
+        if settings.direction != Direction.OUTPUT:
+            line.values.pop(port, None)
+        _LOGGER.debug(f"reconfigured port {port} of {line}: {settings}")
+        return line
+
+    async def async_claim_port(self, port: int, chip: str | None = None):
+        gpio_chip = await self._async_chip(chip)
+        await gpio_chip.async_run(self._hass, self.claim_port, port, chip)
+
+    async def async_release(self, line: LineGroup, port: int) -> None:
+        # readers belong to the loop, the request itself is released on the GPIO thread
+        self.remove_event_handler(line, port)
+        self.remove_output(line, port)
+        await line.chip.async_run(self._hass, self.release, line, port)
+        if not self._reloading:
+            await self._async_shrink(line)
+
+    async def _async_shrink(self, line: LineGroup) -> None:
+        """Free the released ports of a shared request in the kernel, the reader moves to a new request"""
+        if not line.ports or not line.online or not set(line.settings) - line.ports - line.held:
+            return
+        if line.handlers:
+            self._hass.loop.remove_reader(line.fd)
+        try:
+            await line.chip.async_run(self._hass, self.shrink, line)
+        except Exception as e:
+            _LOGGER.error(f"Failed to drop the released ports of {line}: {e}")
+            # requested again by the recovery, like after a chip loss
+            self.take_offline(line)
+            self.recover_chip(line.chip)
+            return
+        if line.handlers:
+            self._hass.loop.add_reader(line.fd, self.handle_events, line)
+
+    def shrink(self, line: LineGroup) -> None:
+        """Drop the released ports of line from its request, on the GPIO thread.
+
+        A request of outputs is never released, its lines would float or be taken in
+        between: the released ports are reconfigured in place to inert inputs and held
+        in it until claimed again. Other requests are requested again without them,
+        pending edges of inputs are lost.
+        """
+        removed = set(line.settings) - line.ports - line.held
+        if any(line.settings[port].direction == Direction.OUTPUT for port in line.ports):
+            for port in removed:
+                line.settings[port] = INERT_SETTINGS
+                line.values.pop(port, None)
+            line.request.reconfigure_lines(line.config())
+            line.held |= removed
+            _LOGGER.debug(f"holding ports {sorted(removed)} in {line}")
+            return
+        for port in set(line.settings) - line.ports:
+            del line.settings[port]
+        line.held.clear()
+        line.request.release()
+        line.request = line.chip.chip.request_lines(consumer=DOMAIN, config=line.config())
+        for port in line.ports:
+            # the new request counts its seqnos from 1
+            self.stats.forget(line.chip.name, port)
+        _LOGGER.debug(f"shrunk {line}")
+
+    def add_event_handler(self, line: LineGroup, port: int, handler: Callable, coalesce: int = 0,
+                          glitch_filter: tuple | None = None, level: bool = False) -> None:
+        """Route edge events of port to handler(event, count), one loop reader per input request.
+
+        With coalesce (ms) set, handler is called at most once per window with the
+        last event and the number of edges folded into it.
+        glitch_filter is (mode, time ms, release time ms) of an EdgeFilter settling
+        the port in userspace starting from level, for lines without hardware debounce.
+        Ports requested without edge detection are polled instead, level is their first snapshot.
+        """
+        if not line.handlers and line.online:
+            _LOGGER.debug(f"add_event_handler: Adding fd:{line.fd}")
+            self._hass.loop.add_reader(line.fd, self.handle_events, line)
+        handler = Coalescer(self._hass, handler, coalesce) if coalesce else handler
+        rules = self._rules.get((line.chip.path, port))
+        if rules:
+            # after the glitch filter, before coalescing, so every settled edge drives the outputs
+            handler = RuleHandler(self, rules, handler, settled=glitch_filter is not None)
+        line.handlers[port] = handler
+        if glitch_filter:
+            mode, time_ms, release_ms = glitch_filter
+            line.filters[port] = EdgeFilter(self.wheel, line.handlers[port], mode, time_ms, release_ms, level)
+        if port in line.poll:
+            self.poller.add(line, port, level)
+        if self.history_size:
+            key = (line.chip.path, port)
+            if key not in self.history:
+                self.history[key] = EdgeHistory(self.history_size)
+            line.history[port] = self.history[key]
+
+    def remove_event_handler(self, line: LineGroup, port: int) -> None:
+        if port not in line.handlers:
+            return
+        if port in line.filters:
+            line.filters.pop(port).cancel()
+        if port in line.poll:
+            self.poller.remove(line, port)
+        line.history.pop(port, None)
+        handler = line.handlers.pop(port)
+        if isinstance(handler, RuleHandler):
+            handler = handler.handler
+        if isinstance(handler, Coalescer):
+            handler.cancel()
+        if not line.handlers and line.online:
+            _LOGGER.debug(f"remove_event_handler: Removing fd:{line.fd}")
+            self._hass.loop.remove_reader(line.fd)
+
+    def handle_events(self, line: LineGroup) -> None:
+        """Drain the request in bulk and hand each entity the last event of its port"""
+        batch = line.batch
+        pending = line.pending
+        track = self.stats.track
+        chip = line.chip.name
+        filters = line.filters
+        histories = line.history
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        try:
+            read = line.request.read_edge_events(EDGE_EVENT_BATCH)
+        except OSError as e:
+            # the request fd turns readable with an error once the chip is gone
+            self.chip_lost(line.chip, e)
+            return
+        for event in read:
+            if debug:
+                _LOGGER.debug("Event: %s", event)
+            track(chip, event)
+            if histories:
+                history = histories.get(event.line_offset)
+                if history is not None:
+                    history.append(event.timestamp_ns, event.event_type is EventType.RISING_EDGE, event.line_seqno)
+            if filters and event.line_offset in filters:
+                # filtered ports see every edge, their handler is called once the level settles
+                filters[event.line_offset].feed(event)
+                continue
+            entry = batch.get(event.line_offset)
+            if entry is None:
+                entry = batch[event.line_offset] = [None, 0]
+            if not entry[1]:
+                pending.append(event.line_offset)
+            entry[0] = event
+            entry[1] += 1
+        handlers = line.handlers
+        record_time = self.stats.record_time
+        handler_time = self.stats.handler_time
+        try:
+            for port in pending:
+                handler = handlers.get(port)
+                if handler:
+                    event, count = batch[port]
+                    start = time.perf_counter_ns()
+                    handler(event, count)
+                    record_time(handler_time, chip, port, time.perf_counter_ns() - start)
+        finally:
+            for port in pending:
+                entry = batch[port]
+                entry[0] = None
+                entry[1] = 0
+            pending.clear()
+
+    def dispatch(self, line: LineGroup, port: int, event) -> None:
+        """Hand a single event to the filter or handler of port"""
+        self.stats.count(line.chip.name, port)
+        if port in line.history:
+            line.history[port].append(event.timestamp_ns, event.event_type is EventType.RISING_EDGE, event.line_seqno)
+        if port in line.filters:
+            line.filters[port].feed(event)
+        elif port in line.handlers:
+            start = time.perf_counter_ns()
+            line.handlers[port](event, 1)
+            self.stats.record_time(self.stats.handler_time, line.chip.name, port, time.perf_counter_ns() - start)
+
+    def get_history(self, key: tuple, start_ns: int | None = None, end_ns: int | None = None) -> tuple[EdgeHistory, list]:
+        """History of an input and its edges within the window, key is (chip path, port), see output_key"""
+        history = self.history.get(key)
+        if history is None:
+            raise ServiceValidationError(f"Port {key[1]} of {key[0]} has no edge history, it is not a {DOMAIN} input")
+        return history, history.events(start_ns, end_ns)
+
+    async def async_counters(self) -> dict:
+        """Totals of the event and ioctl counters, one snapshot per update of the diagnostic sensors"""
+        return {
+            **self.stats.totals(),
+            "latency_p99_ms": self.stats.as_dict()["latency_p99_ms"],
+            "open_fds": await self._hass.async_add_executor_job(open_fds),
+        }
+
+    async def async_diagnostics(self) -> dict:
+        return {**self.diagnostics(), "counters": await self.async_counters()}
+
+    def diagnostics(self) -> dict:
+        return {
+            "path": self._path,
+            "online": self._online,
+            "chips": {
+                chip.path: {
+                    "name": chip.name,
+                    "label": chip.label,
+                    "num_lines": chip.info.num_lines,
+                    "active": chip.executor is not None,
+                    "lost": chip.lost,
+                    "offline_ports": sorted(port for line in list(chip.lines) if not line.online for port in line.ports),
+                    "ports": sorted(port for path, port in self._ports if path == chip.path),
+                    "lines_in_use": {
+                        offset: info.consumer for offset, info in chip.line_info.items() if info.used
+                    },
+                }
+                for chip in self._chips.values()
+            },
+            "events": self.stats.as_dict(),
+            "lines": self.stats.lines(),
+            "pulses": {f"{chip}:{port}": pulse for (chip, port), pulse in self.pulses.items()},
+            "pwm": self.pwm.as_dict(),
+        }
+
     @property
     def hub_id(self) -> str:
         """ID for hub"""
         return self._id
 
-    def add_switch(self, port, active_low, bias, drive_mode, init_state) -> gpiod.LineRequest:
-        _LOGGER.debug(f"add_switch - port: {port}, active_low: {active_low}, bias: {bias}, drive_mode: {drive_mode}, init_state: {init_state}")
+    async def _async_per_chip(self, func, specs) -> dict:
+        """Run a batch call once per chip, each on the thread of its chip"""
+        batches: Dict[GpioChip, list] = {}
+        for spec in specs:
+            batches.setdefault(await self._async_chip(spec[0]), []).append(spec)
+        lines = {}
+        for result in await asyncio.gather(
+                *(chip.async_run(self._hass, func, batch) for chip, batch in batches.items())):
+            lines.update(result)
+        return lines
+
+    def add_switches(self, switches) -> Dict[tuple, LineGroup]:
+        """Request output lines, all settings groups of a chip share one LineRequest when possible,
+        so outputs set together through set_values change in a single ioctl.
+
+        switches: iterable of (chip, port, active_low, bias, drive_mode, init_state),
+        chip is a path, name or label or None for the default chip.
+        Returns {(chip, port): LineGroup}
+        """
+        lines = {}
+        groups: Dict[tuple, list] = {}
+        keys: Dict[tuple, object] = {}
+        values: Dict[GpioChip, Dict[int, Value]] = {}
+        for chip, port, active_low, bias, drive_mode, init_state in switches:
+            _LOGGER.debug(f"add_switch - chip: {chip}, port: {port}, active_low: {active_low}, bias: {bias}, drive_mode: {drive_mode}, init_state: {init_state}")
+            gpio_chip = self.resolve_chip(chip)
+            if (gpio_chip.path, port) in self._parked:
+                # kept over a reload, an output goes on driving its current value
+                line = self.reuse_parked(gpio_chip, port, output_settings(active_low, bias, drive_mode), init_state)
+                if line:
+                    lines[(chip, port)] = line
+                continue
+            keys[(gpio_chip, port)] = chip
+            groups.setdefault((gpio_chip, active_low, bias, drive_mode), []).append(port)
+            values.setdefault(gpio_chip, {})[port] = \
+                Value.ACTIVE if init_state is not None and init_state else Value.INACTIVE
+        self.verify_online()
+
+        configs: Dict[GpioChip, dict] = {}
+        for (gpio_chip, active_low, bias, drive_mode), ports in groups.items():
+            configs.setdefault(gpio_chip, {})[tuple(ports)] = output_settings(active_low, bias, drive_mode)
+
+        pending = list(configs.items())
+        while pending:
+            gpio_chip, config = pending.pop()
+            ports = [port for group in config for port in group]
+            try:
+                line_request = gpio_chip.chip.request_lines(
+                    consumer=DOMAIN,
+                    config=config,
+                    output_values={port: values[gpio_chip][port] for port in ports})
+            except Exception as e:
+                if len(config) > 1:
+                    # the kernel limits distinct settings per request, fall back to one request per group
+                    _LOGGER.debug(f"add_switches combined request failed: {e}, splitting {len(config)} groups")
+                    pending.extend((gpio_chip, {group: settings}) for group, settings in config.items())
+                    continue
+                _LOGGER.error(f"Failed to request output ports {ports} on {gpio_chip.path}: {e}")
+                self._ports.difference_update((gpio_chip.path, port) for port in ports)
+                continue
+            _LOGGER.debug(f"add_switches line_request: {line_request}")
+            line = LineGroup(gpio_chip, line_request, config)
+            line.values = {port: values[gpio_chip][port] == Value.ACTIVE for port in ports}
+            gpio_chip.lines.add(line)
+            self._ports.update((gpio_chip.path, port) for port in ports)
+            for port in ports:
+                lines[(keys[(gpio_chip, port)], port)] = line
+        return lines
+
+    async def async_add_switches(self, switches) -> Dict[tuple, LineGroup]:
+        return await self._async_per_chip(self.add_switches, switches)
+
+    def output_key(self, port: int | str, chip: str | None = None) -> tuple[str, int]:
+        """(chip path, offset) of a configured port or line name"""
+        chip, port = self.resolve_line(port, chip)
+        return self.resolve_chip(chip).path, port
+
+    def add_output(self, line: LineGroup, port: int, callback: Callable) -> None:
+        """Make port settable through set_outputs, callback(value) updates the entity state"""
+        self._outputs[(line.chip.path, port)] = (line, callback)
+
+    def remove_output(self, line: LineGroup, port: int) -> None:
+        self._outputs.pop((line.chip.path, port), None)
+
+    async def async_set_outputs(self, values: Dict[tuple, bool]) -> None:
+        """Set several outputs at once, one set_values ioctl per line request.
+
+        values: {(chip path, port): value}, see output_key
+        """
+        batches: Dict[LineGroup, Dict[int, bool]] = {}
+        for key, value in values.items():
+            if key not in self._outputs:
+                raise ServiceValidationError(f"Port {key[1]} of {key[0]} is not a {DOMAIN} switch")
+            batches.setdefault(self._outputs[key][0], {})[key[1]] = value
+        active = {key for key, value in values.items() if value}
+        for key in active:
+            if active.intersection(self._interlocks.get(key, ())):
+                raise ServiceValidationError(f"Interlocked ports {sorted(port for _, port in active)} cannot be active together")
+        results = await asyncio.gather(
+            *(self.async_set_values(line, ports) for line, ports in batches.items()), return_exceptions=True)
+        # no await below, all entity states are written in the same loop iteration
+        errors = []
+        for (line, ports), result in zip(batches.items(), results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            # the requests that were driven show their new states even when another one failed
+            for port, value in ports.items():
+                output = self._outputs.get((line.chip.path, port))
+                if output:
+                    output[1](value)
+        if errors:
+            raise errors[0]
+
+    def add_rule(self, input_key: tuple, output_key: tuple, action: str, edge: str = "RISING") -> None:
+        """Drive an output entity straight from the edge events of an input entity, keys are
+        (chip path, port), see output_key.
+
+        follow / invert set the output to the input level / its inverse on every edge,
+        toggle flips the output on each edge (RISING or FALLING). The output is driven
+        in the event reader before any state is written, entities are updated after.
+        Rules are added before the platforms are set up.
+        """
+        self._rules.setdefault(input_key, []).append((output_key, action, edge))
+
+    def add_interlock(self, keys: list) -> None:
+        """At most one of the outputs is active, the others are driven inactive before one goes active"""
+        for key in keys:
+            self._interlocks.setdefault(key, []).extend(other for other in keys if other != key)
+
+    def interlock(self, key: tuple, keep=()) -> None:
+        """Drive the active outputs interlocked with key inactive, except those in keep.
+        Runs on any thread, the entity states are updated on the loop.
+        """
+        for other in self._interlocks.get(key, ()):
+            output = self._outputs.get(other)
+            if other in keep or not output or not output[0].values.get(other[1]):
+                continue
+            line, callback = output
+            _LOGGER.debug("interlock: %s released for %s", other, key)
+            line.request.set_value(other[1], Value.INACTIVE)
+            line.values[other[1]] = False
+            self._hass.loop.call_soon_threadsafe(callback, False)
+
+    def apply_rule(self, key: tuple, action: str, edge: str, rising: bool, count: int) -> None:
+        """Evaluate a rule in the event reader, the output is driven before the event handler runs"""
+        output = self._outputs.get(key)
+        if output is None:
+            # output entity not added (yet)
+            return
+        line, callback = output
+        port = key[1]
+        if action == RULE_FOLLOW:
+            value = rising
+        elif action == RULE_INVERT:
+            value = not rising
+        else:
+            # count edges alternate and end on the last one, flip once per edge of the rule
+            edges = (count + 1) // 2 if rising == (edge == "RISING") else count // 2
+            if edges % 2 == 0:
+                return
+            value = not line.values.get(port, False)
+        if line.values.get(port) == value:
+            return
+        try:
+            if value:
+                self.interlock(key)
+            start = time.perf_counter_ns()
+            line.request.set_value(port, Value.ACTIVE if value else Value.INACTIVE)
+            self.stats.record_time(self.stats.set_value_time, line.chip.name, port, time.perf_counter_ns() - start)
+        except Exception as e:
+            _LOGGER.error(f"Rule failed to drive port {port} of {key[0]}: {e}")
+            return
+        line.values[port] = value
+        callback(value)
+
+    async def async_pulse_output(self, key: tuple, width: float) -> float:
+        """Pulse an output entity, key is (chip path, port), see output_key"""
+        if key not in self._outputs:
+            raise ServiceValidationError(f"Port {key[1]} of {key[0]} is not a {DOMAIN} switch")
+        line, callback = self._outputs[key]
+        callback(True)
+        try:
+            return await self.async_pulse(line, key[1], width)
+        finally:
+            callback(False)
+
+    async def async_pulse(self, line, port, width: float) -> float:
+        """Drive port active for width seconds, returns the measured pulse width in seconds"""
+        _LOGGER.debug("in pulse %s %ss", port, width)
+        future = self._hass.loop.create_future()
+
+        def done(pulse: Pulse) -> None:
+            self._hass.loop.call_soon_threadsafe(self._pulse_done, future, pulse)
+
+        self.pulser.submit(Pulse(line, port, int(width * 1e9), done))
+        pulse = await future
+        if isinstance(pulse.error, OSError):
+            self.output_failed(line, pulse.error)
+        if pulse.error:
+            raise pulse.error
+        return pulse.measured / 1e9
+
+    @staticmethod
+    def _pulse_done(future: asyncio.Future, pulse: Pulse) -> None:
+        if not future.done():
+            # the caller may be gone, the pulse ended anyway
+            future.set_result(pulse)
+
+    def begin_pulse(self, pulse: Pulse) -> None:
+        """On the pulse thread, the set_value ioctls bypass the chip thread, each is atomic in the kernel"""
+        line, port = pulse.line, pulse.port
         self.verify_online()
-        self.verify_port_ready(port)
-
-        line_request = self._chip.request_lines(
-            consumer=DOMAIN,
-            config={port: gpiod.LineSettings(
-                direction = Direction.OUTPUT,
-                bias = BIAS[bias],
-                drive = DRIVE[drive_mode],
-                active_low = active_low,
-                output_value = Value.ACTIVE if init_state is not None and init_state else Value.INACTIVE)})
-        _LOGGER.debug(f"add_switch line_request: {line_request}")
-        return line_request
+        self.verify_line(line)
+        self.interlock(pulse.key)
+        line.request.set_value(port, Value.ACTIVE)
+        pulse.start = time.monotonic_ns()
+        line.values[port] = True
+
+    def end_pulse(self, pulse: Pulse) -> None:
+        line, port = pulse.line, pulse.port
+        try:
+            line.request.set_value(port, Value.INACTIVE)
+        finally:
+            pulse.measured = time.monotonic_ns() - pulse.start
+            line.values[port] = False
+        stats = self.pulses.setdefault((line.chip.name, port), {"count": 0, "last_ms": None, "max_error_ms": 0})
+        stats["count"] += 1
+        stats["last_ms"] = round(pulse.measured / 1e6, 3)
+        stats["max_error_ms"] = max(stats["max_error_ms"], round(abs(pulse.measured - pulse.width_ns) / 1e6, 3))
+        _LOGGER.debug("pulse %s measured %.3f ms", port, pulse.measured / 1e6)
+
+    async def async_turn_on(self, line, port) -> None:
+        await self._async_output(self.turn_on, line, port)
+
+    async def async_turn_off(self, line, port) -> None:
+        await self._async_output(self.turn_off, line, port)
+
+    async def async_set_values(self, line, values: Dict[int, bool]) -> None:
+        await self._async_output(self.set_values, line, values)
+
+    async def _async_output(self, func, line, *args) -> None:
+        try:
+            await line.chip.async_run(self._hass, func, line, *args)
+        except OSError as e:
+            self.output_failed(line, e)
+
+    def output_failed(self, line: LineGroup, error: OSError) -> None:
+        """An output ioctl failed, a chip that was reset or dropped off the bus is recovered"""
+        if error.errno in CHIP_LOST_ERRORS and line.online:
+            self.chip_lost(line.chip, error)
+        raise HomeAssistantError(f"Failed to drive {line.chip.path}: {error}") from error
 
     def turn_on(self, line, port) -> None:
-        _LOGGER.debug(f"in turn_on {port}")
+        _LOGGER.debug("in turn_on %s", port)
         self.verify_online()
-        line.set_value(port, Value.ACTIVE)
+        self.verify_line(line)
+        self.interlock((line.chip.path, port))
+        start = time.perf_counter_ns()
+        line.request.set_value(port, Value.ACTIVE)
+        self.stats.record_time(self.stats.set_value_time, line.chip.name, port, time.perf_counter_ns() - start)
+        line.values[port] = True
 
     def turn_off(self, line, port) -> None:
-        _LOGGER.debug(f"in turn_off {port}")
+        _LOGGER.debug("in turn_off %s", port)
         self.verify_online()
-        line.set_value(port, Value.INACTIVE)
+        self.verify_line(line)
+        start = time.perf_counter_ns()
+        line.request.set_value(port, Value.INACTIVE)
+        self.stats.record_time(self.stats.set_value_time, line.chip.name, port, time.perf_counter_ns() - start)
+        line.values[port] = False
 
-    def add_sensor(self, port, active_low, bias, debounce) -> gpiod.LineRequest:
-        _LOGGER.debug(f"add_sensor - port: {port}, active_low: {active_low}, bias: {bias}, debounce: {debounce}")
+    def set_values(self, line, values: Dict[int, bool]) -> None:
+        """Drive several ports of the same request in a single ioctl"""
+        _LOGGER.debug("in set_values %s", values)
         self.verify_online()
-        self.verify_port_ready(port)
-
-        line_request = self._chip.request_lines(
-            consumer=DOMAIN,
-            config={port: gpiod.LineSettings(
-                direction = Direction.INPUT,
-                edge_detection = Edge.BOTH,
-                bias = BIAS[bias],
-                active_low = active_low,
-                debounce_period = timedelta(milliseconds=debounce),
-                event_clock = Clock.REALTIME)})
-        _LOGGER.debug(f"add_sensor line_request: {line_request}")
-        current_is_on = True if line_request.get_value(port) == Value.ACTIVE else False
-        _LOGGER.debug(f"add_sensor current state: {current_is_on}")
-        return line_request, current_is_on
-
-    def add_cover(self, relay_port, relay_active_low, relay_bias, relay_drive, 
-                  state_port, state_bias, state_active_low):
-        _LOGGER.debug(f"add_cover - relay_port: {relay_port}, state_port: {state_port}")
-        relay_line = self.add_switch(relay_port, relay_active_low, relay_bias, relay_drive, False)
-        state_line, current_is_on = self.add_sensor(state_port, state_active_low, state_bias, 50)
-        return relay_line, state_line, current_is_on
+        self.verify_line(line)
+        keys = {(line.chip.path, port) for port, value in values.items() if value}
+        for key in keys:
+            self.interlock(key, keys)
+        start = time.perf_counter_ns()
+        line.request.set_values({port: Value.ACTIVE if value else Value.INACTIVE for port, value in values.items()})
+        elapsed = time.perf_counter_ns() - start
+        for port in values:
+            # the ioctl is shared, each port is charged with its full time
+            self.stats.record_time(self.stats.set_value_time, line.chip.name, port, elapsed)
+        line.values.update(values)
+
+    async def async_add_sensors(self, sensors) -> Dict[tuple, tuple[LineGroup, bool]]:
+        return await self._async_per_chip(self.add_sensors, sensors)
+
+    def add_sensors(self, sensors) -> Dict[tuple, tuple[LineGroup, bool]]:
+        """Request input lines, all settings groups of a chip share one LineRequest when possible.
+
+        sensors: iterable of (chip, port, active_low, bias, debounce[, edge[, poll_interval]])
+        where edge is a key of EDGE, default BOTH. With poll_interval (ms) the line is
+        requested without edge detection and polled, see Poller. Lines whose chip
+        rejects edge detection fall back to polling.
+        Returns {(chip, port): (LineGroup, current_is_on)}
+        """
+        lines = {}
+        groups: Dict[tuple, list] = {}
+        keys: Dict[tuple, object] = {}
+        polls: Dict[tuple, int] = {}
+        poll_edges: Dict[tuple, Edge] = {}
+        for chip, port, active_low, bias, debounce, *extra in sensors:
+            edge = extra[0] if extra else "BOTH"
+            poll = extra[1] if len(extra) > 1 else None
+            _LOGGER.debug(f"add_sensor - chip: {chip}, port: {port}, active_low: {active_low}, bias: {bias}, debounce: {debounce}, edge: {edge}, poll: {poll}")
+            gpio_chip = self.resolve_chip(chip)
+            if poll:
+                edge = None
+                polls[(gpio_chip, port)] = poll
+            if (gpio_chip.path, port) in self._parked and bias in BIAS:
+                # kept over a reload, pending edge events stay queued on the request
+                settings = input_settings(active_low, bias, debounce, edge)
+                line = self.reuse_parked(gpio_chip, port, settings)
+                if not line and edge:
+                    # a line polled before, its chip rejects edge detection
+                    line = self.reuse_parked(gpio_chip, port, replace(settings, edge_detection=Edge.NONE))
+                    poll = POLL_FALLBACK_INTERVAL
+                if line:
+                    if poll:
+                        line.poll[port] = poll
+                        if edge:
+                            line.poll_edges[port] = EDGE[edge]
+                        else:
+                            line.poll_edges.pop(port, None)
+                    elif line.settings[port].edge_detection != Edge.NONE:
+                        line.poll.pop(port, None)
+                        line.poll_edges.pop(port, None)
+                    # a line of a lost chip reads its level once it is requested again, see resume
+                    lines[(chip, port)] = (line, line.online and line.request.get_value(port) == Value.ACTIVE)
+                continue
+            keys[(gpio_chip, port)] = chip
+            groups.setdefault((gpio_chip, active_low, bias, debounce, edge), []).append(port)
+        self.verify_online()
+
+        configs: Dict[GpioChip, dict] = {}
+        for (gpio_chip, active_low, bias, debounce, edge), ports in groups.items():
+            if bias not in BIAS:
+                _LOGGER.error(f"Failed to request input ports {ports}: invalid pull mode {bias}")
+                self._ports.difference_update((gpio_chip.path, port) for port in ports)
+                continue
+            configs.setdefault(gpio_chip, {})[tuple(ports)] = input_settings(active_low, bias, debounce, edge)
 
+        pending = list(configs.items())
+        while pending:
+            gpio_chip, config = pending.pop()
+            ports = [port for group in config for port in group]
+            try:
+                line_request = gpio_chip.chip.request_lines(consumer=DOMAIN, config=config)
+            except Exception as e:
+                if len(config) > 1:
+                    # the kernel limits distinct settings per request, fall back to one request per group
+                    _LOGGER.debug(f"add_sensors combined request failed: {e}, splitting {len(config)} groups")
+                    pending.extend((gpio_chip, {group: settings}) for group, settings in config.items())
+                    continue
+                settings = next(iter(config.values()))
+                if settings.edge_detection != Edge.NONE:
+                    # some expanders cannot detect edges, poll them instead of dropping the sensors
+                    _LOGGER.warning(f"Edge detection of ports {ports} on {gpio_chip.path} failed: {e}, polling every {POLL_FALLBACK_INTERVAL} ms")
+                    for port in ports:
+                        polls[(gpio_chip, port)] = POLL_FALLBACK_INTERVAL
+                        poll_edges[(gpio_chip, port)] = settings.edge_detection
+                    pending.append((gpio_chip, {group: replace(settings, edge_detection=Edge.NONE) for group in config}))
+                    continue
+                _LOGGER.error(f"Failed to request input ports {ports} on {gpio_chip.path}: {e}")
+                self._ports.difference_update((gpio_chip.path, port) for port in ports)
+                continue
+            _LOGGER.debug(f"add_sensors line_request: {line_request}")
+            line = LineGroup(gpio_chip, line_request, config)
+            line.poll = {port: polls[(gpio_chip, port)] for port in ports if (gpio_chip, port) in polls}
+            line.poll_edges = {port: poll_edges[(gpio_chip, port)] for port in ports if (gpio_chip, port) in poll_edges}
+            gpio_chip.lines.add(line)
+            self._ports.update((gpio_chip.path, port) for port in ports)
+            for port, value in zip(ports, line_request.get_values(ports)):
+                lines[(keys[(gpio_chip, port)], port)] = (line, value == Value.ACTIVE)
+                _LOGGER.debug(f"add_sensors port {port} current state: {value == Value.ACTIVE}")
+        return lines
@@ -0,0 +1,136 @@
+from __future__ import annotations
+from typing import Any
+
+from . import DOMAIN
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
+from homeassistant.components.light import ATTR_BRIGHTNESS, ColorMode, LightEntity
+from homeassistant.const import CONF_LIGHTS, CONF_NAME, CONF_PORT, CONF_UNIQUE_ID
+from .hub import DRIVE
+from .const import CONF_CHIP
+CONF_INVERT_LOGIC = "invert_logic"
+DEFAULT_INVERT_LOGIC = False
+CONF_DRIVE = "drive"
+DEFAULT_DRIVE = "PUSH_PULL"
+CONF_FREQUENCY = "frequency"
+DEFAULT_FREQUENCY = 200
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+
+FREQUENCY = vol.All(vol.Coerce(float), vol.Range(min=1, max=2000))
+
+PLATFORM_SCHEMA = vol.All(
+    PLATFORM_SCHEMA.extend({
+        vol.Exclusive(CONF_LIGHTS, CONF_LIGHTS): vol.All(
+            cv.ensure_list, [{
+                vol.Required(CONF_NAME): cv.string,
+                vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_CHIP): cv.string,
+                vol.Optional(CONF_UNIQUE_ID): cv.string,
+                vol.Optional(CONF_INVERT_LOGIC, default=DEFAULT_INVERT_LOGIC): cv.boolean,
+                vol.Optional(CONF_DRIVE, default=DEFAULT_DRIVE): vol.In(DRIVE.keys()),
+                vol.Optional(CONF_FREQUENCY): FREQUENCY,
+            }]
+        ),
+        vol.Optional(CONF_FREQUENCY, default=DEFAULT_FREQUENCY): FREQUENCY,
+    })
+)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None) -> None:
+
+    _LOGGER.debug(f"setup_platform: {config}")
+    hub = hass.data[DOMAIN]
+    if not hub._online:
+        _LOGGER.error("hub not online, bailing out")
+
+    lights = []
+    for light in config.get(CONF_LIGHTS):
+        try:
+            chip, port = hub.resolve_line(light[CONF_PORT], light.get(CONF_CHIP))
+            await hub.async_claim_port(port, chip)
+            lights.append((light, chip, port))
+        except Exception as e:
+            _LOGGER.error(f"Failed to add light {light[CONF_NAME]} for port {light[CONF_PORT]}: {e}")
+
+    # one request per chip, the PWM thread toggles all lights of a chip with one set_values
+    lines = await hub.async_add_switches(
+        (chip, port, light.get(CONF_INVERT_LOGIC), "AS_IS", light.get(CONF_DRIVE), False)
+        for light, chip, port in lights)
+
+    entities = []
+    for light, chip, port in lights:
+        if (chip, port) not in lines:
+            _LOGGER.error(f"Failed to add light {light[CONF_NAME]} for port {light[CONF_PORT]}: line request failed")
+            continue
+        entities.append(
+            GPIODLight(
+                hub,
+                light[CONF_NAME],
+                port,
+                light.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{light[CONF_PORT]}_{light[CONF_NAME].lower().replace(' ', '_')}",
+                lines[(chip, port)],
+                light.get(CONF_FREQUENCY, config[CONF_FREQUENCY])
+            )
+        )
+
+    async_add_entities(entities)
+
+
+class GPIODLight(LightEntity):
+    """Dimmable light driven by software PWM"""
+    _attr_should_poll = False
+    _attr_color_mode = ColorMode.BRIGHTNESS
+    _attr_supported_color_modes = {ColorMode.BRIGHTNESS}
+
+    def __init__(self, hub, name, port, unique_id, line, frequency):
+        _LOGGER.debug(f"GPIODLight init: {port} - {name} - {unique_id} - frequency: {frequency}")
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._port = port
+        self._line = line
+        self._frequency = frequency
+        self._channel = None
+        self._attr_is_on = False
+        self._attr_brightness = 255
+
+    @property
+    def available(self) -> bool:
+        return self._line.online
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._channel = self._hub.pwm.add(self._line, self._port, self._frequency)
+        self._line.listeners.append(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        _LOGGER.debug(f"GPIODLight async_will_remove_from_hass: port {self._port}")
+        self._line.listeners.remove(self.async_write_ha_state)
+        self._hub.pwm.remove(self._channel)
+        if self._line.online:
+            await self._hub.async_turn_off(self._line, self._port)
+        await self._hub.async_release(self._line, self._port)
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        self._attr_brightness = kwargs.get(ATTR_BRIGHTNESS, self._attr_brightness) or 255
+        self._attr_is_on = True
+        self._hub.pwm.set_duty(self._channel, self._attr_brightness / 255)
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        self._attr_is_on = False
+        self._hub.pwm.set_duty(self._channel, 0)
+        self.async_write_ha_state()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from . import DOMAIN
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from homeassistant.exceptions import HomeAssistantError
+
+from typing import Callable, Dict
+from collections import deque
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# pulses sleep until this close to their end, then spin on the monotonic clock
+PULSE_SPIN_NS = 2_000_000
+# SCHED_FIFO priority of the pulse thread, when the process may raise it
+PULSE_PRIORITY = 10
+# seconds stop() waits for the thread to end the pulses in flight
+STOP_TIMEOUT = 1
+
+
+def raise_priority() -> None:
+    """Real time scheduling keeps pulse widths repeatable under load"""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(PULSE_PRIORITY))
+    except (AttributeError, OSError) as e:
+        _LOGGER.debug(f"pulse thread runs at normal priority: {e}")
+
+
+class Pulse:
+    """One pulse of an output port, its times are monotonic ns"""
+
+    def __init__(self, line, port: int, width_ns: int, done: Callable) -> None:
+        self.line = line
+        self.port = port
+        self.key = (line.chip.path, port)
+        self.width_ns = width_ns
+        # done(pulse) is called on the pulse thread once the pulse ended or failed
+        self.done = done
+        self.start = 0
+        self.measured = 0
+        self.error: Exception | None = None
+
+    def __repr__(self) -> str:
+        return f"Pulse({self.line.chip.path}, {self.port}, {self.width_ns / 1e6} ms)"
+
+
+class PulseScheduler:
+    """One thread timing the pulses of every output.
+
+    begin(pulse) drives the port active and end(pulse) inactive again, both are
+    called on the thread. Between them the thread sleeps until the nearest end of
+    any pulse in flight and spins its last PULSE_SPIN_NS, so a long pulse never
+    holds back the others. Pulses of the same port run one after the other.
+    stop() ends the pulses in flight early, every pulse not done fails.
+    """
+
+    def __init__(self, begin: Callable, end: Callable) -> None:
+        self._begin = begin
+        self._end = end
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        # (chip path, port) -> pulses waiting for the running one of that port
+        self._waiting: Dict[tuple, deque] = {}
+        self._busy: set[tuple] = set()
+        # (end monotonic ns, sequence, Pulse) of the pulses in flight
+        self._heap: list = []
+        self._sequence = itertools.count()
+
+    def submit(self, pulse: Pulse) -> None:
+        with self._cond:
+            if self._stopped:
+                raise HomeAssistantError(f"Cannot pulse port {pulse.port}, {DOMAIN} is stopping")
+            self._waiting.setdefault(pulse.key, deque()).append(pulse)
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name=f"{DOMAIN}_pulse", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self) -> None:
+        """Drive the pulses in flight inactive before returning, so no output stays active"""
+        with self._cond:
+            self._stopped = True
+            thread = self._thread
+            self._cond.notify()
+        if thread:
+            thread.join(STOP_TIMEOUT)
+
+    def _cancel(self) -> None:
+        for _, _, pulse in self._heap:
+            try:
+                self._end(pulse)
+                pulse.error = HomeAssistantError(f"{pulse} cut short, {DOMAIN} is stopping")
+            except Exception as e:
+                pulse.error = e
+            pulse.done(pulse)
+        for queue in self._waiting.values():
+            for pulse in queue:
+                pulse.error = HomeAssistantError(f"{pulse} not started, {DOMAIN} is stopping")
+                pulse.done(pulse)
+        self._heap.clear()
+        self._waiting.clear()
+        self._busy.clear()
+
+    def _start_waiting(self) -> None:
+        for key in [key for key in self._waiting if key not in self._busy]:
+            queue = self._waiting[key]
+            pulse = queue.popleft()
+            if not queue:
+                del self._waiting[key]
+            try:
+                self._begin(pulse)
+            except Exception as e:
+                pulse.error = e
+                pulse.done(pulse)
+                continue
+            self._busy.add(key)
+            heapq.heappush(self._heap, (pulse.start + pulse.width_ns, next(self._sequence), pulse))
+
+    def _run(self) -> None:
+        raise_priority()
+        while True:
+            with self._cond:
+                if self._stopped:
+                    self._cancel()
+                    return
+                self._start_waiting()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                remaining = self._heap[0][0] - time.monotonic_ns()
+                if remaining > PULSE_SPIN_NS:
+                    # woken early by a new pulse, it starts right away
+                    self._cond.wait((remaining - PULSE_SPIN_NS) / 1e9)
+                    continue
+                end, _, pulse = heapq.heappop(self._heap)
+            # spin without the lock, submit() never waits for it
+            while time.monotonic_ns() < end:
+                pass
+            try:
+                self._end(pulse)
+            except Exception as e:
+                pulse.error = e
+            with self._cond:
+                self._busy.discard(pulse.key)
+            pulse.done(pulse)
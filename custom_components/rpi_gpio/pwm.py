@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from . import DOMAIN
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from typing import Dict
+from collections import deque
+import threading
+import time
+
+from gpiod.line import Value
+
+# transitions due within this window are written in the same set_values call
+PWM_MERGE_NS = 100_000
+# rolling window of transition lateness used for percentiles
+JITTER_SAMPLES = 1000
+
+
+class PwmChannel:
+    """Software PWM on one output port"""
+
+    def __init__(self, line, port: int, frequency: float) -> None:
+        self.line = line
+        self.port = port
+        self.frequency = frequency
+        self.period = int(1e9 / frequency)
+        self.duty = 0.0
+        self.on = 0
+        self.level = False
+        # monotonic ns of the next transition while the duty is between 0 and 1
+        self.next = 0
+
+    def __repr__(self) -> str:
+        return f"PwmChannel({self.line.chip.path}, {self.port}, {self.frequency}Hz, duty={self.duty})"
+
+
+class PwmScheduler:
+    """One thread generating PWM for every channel.
+
+    It sleeps until the next transition of any channel, then writes all
+    transitions due with one set_values per line request, so channels of a
+    platform on one chip toggle in a single ioctl. Channels of the same
+    frequency are phase aligned, their rising edges always share a call.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._running = False
+        self._channels: set[PwmChannel] = set()
+        self._active: set[PwmChannel] = set()
+        # static levels (duty 0 or 1) waiting to be written by the thread
+        self._pending: Dict[PwmChannel, bool] = {}
+        self._epoch = time.monotonic_ns()
+        self.jitter = deque(maxlen=JITTER_SAMPLES)
+        self.ticks = 0
+        self.set_values_calls = 0
+        self.errors = 0
+        self._cpu_ns = 0
+        self._started = 0
+
+    def add(self, line, port: int, frequency: float) -> PwmChannel:
+        channel = PwmChannel(line, port, frequency)
+        with self._cond:
+            self._channels.add(channel)
+            if not self._thread:
+                self._running = True
+                self._started = time.monotonic_ns()
+                self._thread = threading.Thread(target=self._run, name=f"{DOMAIN}_pwm", daemon=True)
+                self._thread.start()
+        return channel
+
+    def remove(self, channel: PwmChannel) -> None:
+        """No write of channel follows once this returns, the caller drives the line afterwards"""
+        with self._cond:
+            self._channels.discard(channel)
+            self._active.discard(channel)
+            self._pending.pop(channel, None)
+
+    def set_duty(self, channel: PwmChannel, duty: float) -> None:
+        duty = min(max(duty, 0.0), 1.0)
+        with self._cond:
+            if channel not in self._channels:
+                return
+            channel.duty = duty
+            channel.on = int(channel.period * duty)
+            if duty in (0.0, 1.0):
+                self._active.discard(channel)
+                channel.next = 0
+                self._pending[channel] = duty == 1.0
+            elif channel not in self._active:
+                # start on the next period boundary shared by all channels of this frequency
+                now = time.monotonic_ns()
+                channel.next = now + channel.period - (now - self._epoch) % channel.period
+                channel.level = False
+                self._active.add(channel)
+            self._cond.notify()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _run(self) -> None:
+        cpu_start = time.thread_time_ns()
+        with self._cond:
+            while self._running:
+                if not self._active and not self._pending:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic_ns()
+                batches: Dict[object, Dict[int, bool]] = {}
+                for channel, level in self._pending.items():
+                    channel.level = level
+                    batches.setdefault(channel.line, {})[channel.port] = level
+                self._pending.clear()
+                wake = None
+                for channel in self._active:
+                    if channel.next <= now + PWM_MERGE_NS:
+                        self.jitter.append(max(0, now - channel.next))
+                        channel.level = not channel.level
+                        batches.setdefault(channel.line, {})[channel.port] = channel.level
+                        channel.next += channel.on if channel.level else channel.period - channel.on
+                        if channel.next <= now:
+                            # overrun, skip the lost cycles instead of catching up
+                            channel.next = now + channel.period - (now - self._epoch) % channel.period
+                            channel.level = False
+                            batches[channel.line][channel.port] = False
+                    if wake is None or channel.next < wake:
+                        wake = channel.next
+                # the lock is held over the ioctls, remove() must not return before they are done
+                for line, values in batches.items():
+                    try:
+                        line.request.set_values({port: Value.ACTIVE if value else Value.INACTIVE for port, value in values.items()})
+                    except Exception as e:
+                        self.errors += 1
+                        _LOGGER.debug("PWM set_values on %s failed: %s", line, e)
+                    self.set_values_calls += 1
+                self.ticks += 1
+                self._cpu_ns = time.thread_time_ns() - cpu_start
+                if wake is not None:
+                    timeout = (wake - time.monotonic_ns()) / 1e9
+                    if timeout > 0:
+                        self._cond.wait(timeout)
+
+    def as_dict(self) -> dict:
+        jitter = sorted(self.jitter)
+
+        def percentile(q):
+            return round(jitter[int(q * (len(jitter) - 1))] / 1e3, 1) if jitter else None
+
+        wall = time.monotonic_ns() - self._started if self._started else 0
+        return {
+            "channels": len(self._channels),
+            "active": len(self._active),
+            "ticks": self.ticks,
+            "set_values_calls": self.set_values_calls,
+            "errors": self.errors,
+            "cpu_percent": round(100 * self._cpu_ns / wall, 2) if wall else None,
+            "jitter_p50_us": percentile(0.50),
+            "jitter_p99_us": percentile(0.99),
+            "jitter_max_us": percentile(1),
+        }
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+from . import DOMAIN
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from collections import deque
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.components.sensor import RestoreSensor, SensorEntity, SensorDeviceClass, SensorStateClass
+from homeassistant.const import CONF_SENSORS, CONF_NAME, CONF_PORT, CONF_UNIQUE_ID, EntityCategory, UnitOfFrequency, UnitOfTime
+from .hub import BIAS, EDGE
+from .const import CONF_CHIP
+
+CONF_INVERT_LOGIC = "invert_logic"
+DEFAULT_INVERT_LOGIC = False
+CONF_BOUNCETIME = "bouncetime"
+DEFAULT_BOUNCETIME = 0
+CONF_PULL_MODE = "pull_mode"
+DEFAULT_PULL_MODE = "UP"
+CONF_EDGE = "edge"
+DEFAULT_EDGE = "RISING"
+CONF_UPDATE_INTERVAL = "update_interval"
+DEFAULT_UPDATE_INTERVAL = 10
+CONF_AVERAGE_SAMPLES = "average_samples"
+DEFAULT_AVERAGE_SAMPLES = 6
+CONF_DIAGNOSTICS = "diagnostics"
+DEFAULT_DIAGNOSTICS = False
+# seconds between snapshots of the diagnostic sensors
+DIAGNOSTICS_INTERVAL = 30
+
+# key of Hub.async_counters() -> name, unit, state class of a diagnostic sensor
+DIAGNOSTIC_SENSORS = {
+    "events": ("GPIO events", None, SensorStateClass.TOTAL_INCREASING),
+    "dropped_events": ("GPIO dropped events", None, SensorStateClass.TOTAL_INCREASING),
+    "latency_p99_ms": ("GPIO event latency p99", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT),
+    "handler_max_us": ("GPIO handler time max", UnitOfTime.MICROSECONDS, SensorStateClass.MEASUREMENT),
+    "set_value_max_us": ("GPIO set value time max", UnitOfTime.MICROSECONDS, SensorStateClass.MEASUREMENT),
+    "open_fds": ("GPIO open file descriptors", None, SensorStateClass.MEASUREMENT),
+}
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+
+PLATFORM_SCHEMA = vol.All(
+    PLATFORM_SCHEMA.extend({
+        vol.Exclusive(CONF_SENSORS, CONF_SENSORS): vol.All(
+            cv.ensure_list, [{
+                vol.Required(CONF_NAME): cv.string,
+                vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_CHIP): cv.string,
+                vol.Optional(CONF_PULL_MODE, default=DEFAULT_PULL_MODE): vol.In(BIAS.keys()),
+                vol.Optional(CONF_BOUNCETIME, default=DEFAULT_BOUNCETIME): cv.positive_int,
+                vol.Optional(CONF_INVERT_LOGIC, default=DEFAULT_INVERT_LOGIC): cv.boolean,
+                vol.Optional(CONF_EDGE, default=DEFAULT_EDGE): vol.In(EDGE.keys()),
+                vol.Optional(CONF_UNIQUE_ID): cv.string,
+            }]
+        ),
+        vol.Optional(CONF_UPDATE_INTERVAL, default=DEFAULT_UPDATE_INTERVAL): cv.positive_int,
+        vol.Optional(CONF_AVERAGE_SAMPLES, default=DEFAULT_AVERAGE_SAMPLES): vol.All(cv.positive_int, vol.Range(min=1)),
+        vol.Optional(CONF_DIAGNOSTICS, default=DEFAULT_DIAGNOSTICS): cv.boolean,
+    })
+)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+        discovery_info: DiscoveryInfoType | None = None) -> None:
+
+    _LOGGER.debug(f"setup_platform: {config}")
+    hub = hass.data[DOMAIN]
+    if not hub._online:
+        _LOGGER.error("hub not online, bailing out")
+
+    sensors = []
+    for sensor in config.get(CONF_SENSORS) or []:
+        try:
+            chip, port = hub.resolve_line(sensor[CONF_PORT], sensor.get(CONF_CHIP))
+            await hub.async_claim_port(port, chip)
+            sensors.append((sensor, chip, port))
+        except Exception as e:
+            _LOGGER.error(f"Failed to add pulse counter {sensor[CONF_NAME]} for port {sensor[CONF_PORT]}: {e}")
+
+    lines = await hub.async_add_sensors(
+        (chip, port, sensor.get(CONF_INVERT_LOGIC), sensor.get(CONF_PULL_MODE), sensor.get(CONF_BOUNCETIME), sensor.get(CONF_EDGE))
+        for sensor, chip, port in sensors)
+
+    publisher = PulsePublisher(hass, config[CONF_UPDATE_INTERVAL])
+    entities = []
+    for sensor, chip, port in sensors:
+        if (chip, port) not in lines:
+            _LOGGER.error(f"Failed to add pulse counter {sensor[CONF_NAME]} for port {sensor[CONF_PORT]}: line request failed")
+            continue
+        line, _ = lines[(chip, port)]
+        unique_id = sensor.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{sensor[CONF_PORT]}_{sensor[CONF_NAME].lower().replace(' ', '_')}"
+        counter = PulseCounter(port, config[CONF_AVERAGE_SAMPLES])
+        entities.extend([
+            GPIODPulseCountSensor(hub, publisher, counter, line, sensor[CONF_NAME], unique_id),
+            GPIODPulseRateSensor(counter, f"{sensor[CONF_NAME]} rate", f"{unique_id}_rate", "rate"),
+            GPIODPulseRateSensor(counter, f"{sensor[CONF_NAME]} average rate", f"{unique_id}_average", "average"),
+        ])
+
+    if config[CONF_DIAGNOSTICS]:
+        if hub.diagnostic_sensors:
+            _LOGGER.warning("Diagnostic sensors are added by another rpi_gpio sensor platform already")
+        else:
+            hub.diagnostic_sensors = DiagnosticsPublisher(hass, hub)
+            entities.extend(GPIODDiagnosticSensor(hub.diagnostic_sensors, key) for key in DIAGNOSTIC_SENSORS)
+
+    async_add_entities(entities)
+
+
+class PulseCounter:
+    """Edge counter for one port, updated from the hub event reader"""
+
+    def __init__(self, port, average_samples):
+        self.port = port
+        self.count = 0
+        self.rate = None
+        self.average = None
+        self.listeners = []
+        self._timestamp_ns = 0
+        self._last_count = 0
+        self._last_timestamp_ns = 0
+        self._samples = deque(maxlen=average_samples + 1)
+
+    def handle_event(self, event, count):
+        # hot path, keep it to plain arithmetic
+        self.count += count
+        self._timestamp_ns = event.timestamp_ns
+
+    def restore(self, count):
+        self.count = self._last_count = count
+
+    def publish(self):
+        """Derive rate from the kernel timestamps of the edges seen since last publish"""
+        count, timestamp_ns = self.count, self._timestamp_ns
+        if count == self._last_count:
+            self.rate = 0.0
+        elif self._last_timestamp_ns and timestamp_ns > self._last_timestamp_ns:
+            self.rate = (count - self._last_count) * 1e9 / (timestamp_ns - self._last_timestamp_ns)
+        self._last_count, self._last_timestamp_ns = count, timestamp_ns
+
+        self._samples.append((count, timestamp_ns))
+        first_count, first_timestamp_ns = self._samples[0]
+        if count == first_count:
+            self.average = 0.0 if len(self._samples) > 1 else None
+        elif first_timestamp_ns and timestamp_ns > first_timestamp_ns:
+            self.average = (count - first_count) * 1e9 / (timestamp_ns - first_timestamp_ns)
+
+        for listener in self.listeners:
+            listener()
+
+
+class PulsePublisher:
+    """One timer publishing all pulse counters of a platform"""
+
+    def __init__(self, hass, interval):
+        self._hass = hass
+        self._interval = timedelta(seconds=interval)
+        self._counters = set()
+        self._unsub = None
+
+    def add(self, counter):
+        self._counters.add(counter)
+        if not self._unsub:
+            self._unsub = async_track_time_interval(self._hass, self._async_publish, self._interval)
+
+    def remove(self, counter):
+        self._counters.discard(counter)
+        if not self._counters and self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_publish(self, now):
+        for counter in self._counters:
+            counter.publish()
+
+
+class GPIODPulseCountSensor(RestoreSensor):
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(self, hub, publisher, counter, line, name, unique_id):
+        _LOGGER.debug(f"GPIODPulseCountSensor init: {counter.port} - {name} - {unique_id}")
+        self._hub = hub
+        self._publisher = publisher
+        self._counter = counter
+        self._line = line
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._attr_native_value = 0
+
+    @property
+    def available(self) -> bool:
+        return self._line.online
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last and isinstance(last.native_value, (int, float)):
+            self._counter.restore(int(last.native_value))
+            self._attr_native_value = self._counter.count
+        self._counter.listeners.append(self._publish)
+        self._hub.add_event_handler(self._line, self._counter.port, self._counter.handle_event)
+        self._publisher.add(self._counter)
+        self._line.listeners.append(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        _LOGGER.debug(f"GPIODPulseCountSensor async_will_remove_from_hass: port {self._counter.port}")
+        self._publisher.remove(self._counter)
+        self._counter.listeners.remove(self._publish)
+        self._line.listeners.remove(self.async_write_ha_state)
+        await self._hub.async_release(self._line, self._counter.port)
+
+    @callback
+    def _publish(self):
+        self._attr_native_value = self._counter.count
+        self.async_write_ha_state()
+
+
+class GPIODPulseRateSensor(SensorEntity):
+    _attr_should_poll = False
+    _attr_device_class = SensorDeviceClass.FREQUENCY
+    _attr_native_unit_of_measurement = UnitOfFrequency.HERTZ
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 2
+
+    def __init__(self, counter, name, unique_id, kind):
+        self._counter = counter
+        self._kind = kind
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._counter.listeners.append(self._publish)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        self._counter.listeners.remove(self._publish)
+
+    @callback
+    def _publish(self):
+        self._attr_native_value = getattr(self._counter, self._kind)
+        self.async_write_ha_state()
+
+
+class DiagnosticsPublisher:
+    """One timer taking a snapshot of the hub counters for all diagnostic sensors"""
+
+    def __init__(self, hass, hub, interval=DIAGNOSTICS_INTERVAL):
+        self._hass = hass
+        self._hub = hub
+        self._interval = timedelta(seconds=interval)
+        self._sensors = set()
+        self._unsub = None
+
+    def add(self, sensor):
+        self._sensors.add(sensor)
+        if not self._unsub:
+            self._unsub = async_track_time_interval(self._hass, self.async_publish, self._interval)
+            self._hass.async_create_task(self.async_publish())
+
+    def remove(self, sensor):
+        self._sensors.discard(sensor)
+        if not self._sensors:
+            if self._unsub:
+                self._unsub()
+                self._unsub = None
+            if self._hub.diagnostic_sensors is self:
+                self._hub.diagnostic_sensors = None
+
+    async def async_publish(self, now=None):
+        counters = await self._hub.async_counters()
+        for sensor in self._sensors:
+            sensor.publish(counters)
+
+
+class GPIODDiagnosticSensor(SensorEntity):
+    """Counter of the hub, published on a timer so the event path never writes its state"""
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, publisher, key):
+        self._publisher = publisher
+        self._key = key
+        self._attr_name, self._attr_native_unit_of_measurement, self._attr_state_class = DIAGNOSTIC_SENSORS[key]
+        self._attr_unique_id = f"{DOMAIN}_diagnostics_{key}"
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._publisher.add(self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        self._publisher.remove(self)
+
+    @callback
+    def publish(self, counters):
+        self._attr_native_value = counters[self._key]
+        self.async_write_ha_state()
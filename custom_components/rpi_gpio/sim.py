@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+from typing import Dict, Iterable
+from collections import deque
+import errno
+import os
+import threading
+import time
+import gpiod
+
+from gpiod.line import Direction, Value, Bias, Edge, Clock
+
+EventType = gpiod.EdgeEvent.Type
+InfoType = gpiod.InfoEvent.Type
+
+# edge events kept per request and line before the oldest is dropped, as the kernel does
+EVENT_BUFFER_PER_LINE = 16
+
+
+class SimChipInfo:
+    def __init__(self, name: str, label: str, num_lines: int) -> None:
+        self.name = name
+        self.label = label
+        self.num_lines = num_lines
+
+    def __repr__(self) -> str:
+        return f"<SimChipInfo name={self.name} label={self.label} num_lines={self.num_lines}>"
+
+
+class SimLineInfo:
+    def __init__(self, offset: int, name: str, consumer: str | None, settings: gpiod.LineSettings | None) -> None:
+        # a free line reads as a plain input, as the kernel reports it
+        settings = settings or gpiod.LineSettings(direction=Direction.INPUT)
+        self.offset = offset
+        self.name = name
+        self.used = consumer is not None
+        self.consumer = consumer
+        self.direction = settings.direction
+        self.active_low = settings.active_low
+        self.bias = settings.bias
+        self.drive = settings.drive
+        self.edge_detection = settings.edge_detection
+        self.event_clock = settings.event_clock
+        self.debounce_period = settings.debounce_period
+        self.debounced = bool(settings.debounce_period)
+
+    def __repr__(self) -> str:
+        return f"<SimLineInfo offset={self.offset} name={self.name} used={self.used} consumer={self.consumer} direction={self.direction}>"
+
+
+class SimEdgeEvent:
+    Type = EventType
+
+    def __init__(self, event_type, timestamp_ns: int, line_offset: int, global_seqno: int, line_seqno: int) -> None:
+        self.event_type = event_type
+        self.timestamp_ns = timestamp_ns
+        self.line_offset = line_offset
+        self.global_seqno = global_seqno
+        self.line_seqno = line_seqno
+
+    def __repr__(self) -> str:
+        return f"<SimEdgeEvent type={self.event_type} timestamp_ns={self.timestamp_ns} line_offset={self.line_offset} line_seqno={self.line_seqno}>"
+
+
+class SimInfoEvent:
+    def __init__(self, event_type, timestamp_ns: int, line_info: SimLineInfo) -> None:
+        self.event_type = event_type
+        self.timestamp_ns = timestamp_ns
+        self.line_info = line_info
+
+
+class SimFd:
+    """Non blocking pipe, readable while events are queued so the loop reader fires"""
+
+    def __init__(self) -> None:
+        self.fd, self._write = os.pipe()
+        os.set_blocking(self.fd, False)
+        os.set_blocking(self._write, False)
+
+    def signal(self) -> None:
+        try:
+            os.write(self._write, b"\0")
+        except BlockingIOError:
+            # pipe full, already readable
+            pass
+
+    def drain(self) -> None:
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+        os.close(self._write)
+
+
+class SimLine:
+    """One simulated line: its external drive and, while requested, its request settings"""
+
+    def __init__(self, offset: int, name: str) -> None:
+        self.offset = offset
+        self.name = name
+        # level forced from outside (waveforms), None when floating
+        self.external: bool | None = None
+        # physical level driven by the request of an output
+        self.driven = False
+        self.request: SimLineRequest | None = None
+        self.settings: gpiod.LineSettings | None = None
+        self.seqno = 0
+
+    @property
+    def level(self) -> bool:
+        """Physical level, pull resistors decide a floating input"""
+        settings = self.settings
+        if settings is not None and settings.direction == Direction.OUTPUT:
+            return self.driven
+        if self.external is not None:
+            return self.external
+        return settings is not None and settings.bias == Bias.PULL_UP
+
+    @property
+    def value(self) -> bool:
+        return self.level != bool(self.settings and self.settings.active_low)
+
+
+class SimChip:
+    """In process gpiochip with the gpiod.Chip interface used by the hub.
+
+    Inputs are driven with set_input, play (timed waveform on a thread) or
+    inject (a burst of edges queued at once), outputs are observed with
+    level(). Debounce settings are accepted and ignored, like many expanders.
+    """
+
+    def __init__(self, path: str, name: str, label: str, num_lines: int, line_names: Iterable[str] | None = None,
+                 edge_detection: bool = True) -> None:
+        self.path = path
+        # False for a chip without interrupt, like an expander with its INT pin not wired
+        self.edge_detection = edge_detection
+        self._info = SimChipInfo(name, label, num_lines)
+        names = list(line_names or [])
+        self._lines = [SimLine(offset, names[offset] if offset < len(names) else "") for offset in range(num_lines)]
+        self._lock = threading.RLock()
+        self._watched: set[int] = set()
+        self._info_events: deque = deque()
+        self._info_fd = SimFd()
+        self._global_seqno = 0
+        self._players: list[threading.Event] = []
+        self.closed = False
+        # dropped off the bus, see unplug
+        self.lost = False
+
+    def __repr__(self) -> str:
+        return f"SimChip({self.path}, {self._info.label})"
+
+    @property
+    def fd(self) -> int:
+        return self._info_fd.fd
+
+    def get_info(self) -> SimChipInfo:
+        self._check()
+        return self._info
+
+    def _check(self) -> None:
+        if self.lost:
+            raise OSError(errno.ENODEV, f"{self.path} is gone")
+
+    def line_offset_from_id(self, id: int | str) -> int:
+        if isinstance(id, int):
+            if not 0 <= id < len(self._lines):
+                raise ValueError(f"line {id} out of range")
+            return id
+        for line in self._lines:
+            if line.name == id:
+                return line.offset
+        raise ValueError(f"line {id} not found")
+
+    def _line_info(self, line: SimLine) -> SimLineInfo:
+        return SimLineInfo(line.offset, line.name, line.request.consumer if line.request else None, line.settings)
+
+    def get_line_info(self, line: int | str) -> SimLineInfo:
+        with self._lock:
+            self._check()
+            return self._line_info(self._lines[self.line_offset_from_id(line)])
+
+    def watch_line_info(self, line: int | str) -> SimLineInfo:
+        with self._lock:
+            self._check()
+            offset = self.line_offset_from_id(line)
+            self._watched.add(offset)
+            return self._line_info(self._lines[offset])
+
+    def unwatch_line_info(self, line: int | str) -> None:
+        with self._lock:
+            self._watched.discard(self.line_offset_from_id(line))
+
+    def wait_info_event(self, timeout: float | None = None) -> bool:
+        return self.lost or bool(self._info_events)
+
+    def read_info_event(self) -> SimInfoEvent:
+        with self._lock:
+            self._check()
+            event = self._info_events.popleft()
+            if not self._info_events:
+                self._info_fd.drain()
+            return event
+
+    def _info_changed(self, line: SimLine, event_type) -> None:
+        if line.offset in self._watched:
+            self._info_events.append(SimInfoEvent(event_type, time.monotonic_ns(), self._line_info(line)))
+            self._info_fd.signal()
+
+    def _config(self, config: dict) -> Dict[int, gpiod.LineSettings]:
+        settings: Dict[int, gpiod.LineSettings] = {}
+        for ids, line_settings in config.items():
+            for id in ids if isinstance(ids, tuple) else (ids,):
+                settings[self.line_offset_from_id(id)] = line_settings or gpiod.LineSettings()
+        return settings
+
+    def request_lines(self, config: dict, consumer: str | None = None, event_buffer_size: int | None = None,
+                      output_values: dict | None = None) -> SimLineRequest:
+        with self._lock:
+            self._check()
+            settings = self._config(config)
+            if not self.edge_detection and any(s.edge_detection != Edge.NONE for s in settings.values()):
+                raise OSError(errno.EINVAL, f"{self.path} cannot detect edges")
+            for offset in settings:
+                if self._lines[offset].request:
+                    raise OSError(errno.EBUSY, f"line {offset} of {self.path} busy")
+            values = {self.line_offset_from_id(id): value for id, value in (output_values or {}).items()}
+            request = SimLineRequest(self, consumer or "?", list(settings),
+                                     event_buffer_size or EVENT_BUFFER_PER_LINE * len(settings))
+            for offset, line_settings in settings.items():
+                line = self._lines[offset]
+                line.request = request
+                line.seqno = 0
+                self._apply(line, line_settings, values.get(offset, line_settings.output_value))
+                self._info_changed(line, InfoType.LINE_REQUESTED)
+            return request
+
+    def _apply(self, line: SimLine, settings: gpiod.LineSettings, output_value) -> None:
+        line.settings = settings
+        if settings.direction == Direction.OUTPUT:
+            line.driven = (output_value == Value.ACTIVE) != settings.active_low
+
+    def _reconfigure(self, request: SimLineRequest, config: dict) -> None:
+        with self._lock:
+            self._check()
+            settings = self._config(config)
+            for offset in request.offsets:
+                line = self._lines[offset]
+                line_settings = settings.get(offset) or gpiod.LineSettings()
+                self._apply(line, line_settings, line_settings.output_value)
+                self._info_changed(line, InfoType.LINE_CONFIG_CHANGED)
+
+    def _release(self, request: SimLineRequest) -> None:
+        with self._lock:
+            for offset in request.offsets:
+                line = self._lines[offset]
+                if line.request is request:
+                    line.request = None
+                    line.settings = None
+                    self._info_changed(line, InfoType.LINE_RELEASED)
+
+    def _set(self, request: SimLineRequest, values: Dict[int, Value]) -> None:
+        with self._lock:
+            self._check()
+            for offset, value in values.items():
+                line = self._lines[offset]
+                if line.request is not request or line.settings.direction != Direction.OUTPUT:
+                    raise OSError(errno.EPERM, f"line {offset} of {self.path} is not an output of this request")
+                line.driven = (value == Value.ACTIVE) != line.settings.active_low
+
+    def _edge(self, line: SimLine, old_value: bool, timestamp_ns: int | None) -> None:
+        """Queue an edge event if the line is requested with matching edge detection"""
+        settings = line.settings
+        if not line.request or settings is None or line.value == old_value:
+            return
+        rising = line.value
+        detect = settings.edge_detection
+        if detect == Edge.NONE or (detect == Edge.RISING and not rising) or (detect == Edge.FALLING and rising):
+            return
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns() if settings.event_clock == Clock.REALTIME else time.monotonic_ns()
+        self._global_seqno += 1
+        line.seqno += 1
+        line.request._queue(SimEdgeEvent(
+            EventType.RISING_EDGE if rising else EventType.FALLING_EDGE,
+            timestamp_ns, line.offset, self._global_seqno, line.seqno))
+
+    def set_input(self, line: int | str, level: bool | None, timestamp_ns: int | None = None) -> None:
+        """Drive a line from outside to a physical level, None leaves it floating"""
+        with self._lock:
+            sim_line = self._lines[self.line_offset_from_id(line)]
+            old_value = sim_line.value
+            sim_line.external = level
+            self._edge(sim_line, old_value, timestamp_ns)
+
+    def inject(self, line: int | str, count: int, period_ns: int = 1000) -> None:
+        """Queue count toggles of line at once, spaced period_ns apart in their timestamps"""
+        with self._lock:
+            sim_line = self._lines[self.line_offset_from_id(line)]
+            start = time.time_ns() - count * period_ns
+            for n in range(count):
+                old_value = sim_line.value
+                sim_line.external = not sim_line.level
+                self._edge(sim_line, old_value, start + n * period_ns)
+
+    def play(self, line: int | str, waveform: Iterable[tuple[float, bool]], repeat: int = 1) -> threading.Thread:
+        """Play [(delay ms, level), ...] on line on a thread, repeat 0 loops until stop()"""
+        waveform = list(waveform)
+        stop = threading.Event()
+        self._players.append(stop)
+
+        def run():
+            rounds = 0
+            while not stop.is_set() and (not repeat or rounds < repeat):
+                for delay, level in waveform:
+                    if stop.wait(delay / 1000):
+                        return
+                    self.set_input(line, level)
+                rounds += 1
+
+        thread = threading.Thread(target=run, name=f"sim_{self._info.name}_{line}", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        """Stop all waveforms"""
+        for stop in self._players:
+            stop.set()
+        self._players.clear()
+
+    def level(self, line: int | str) -> bool:
+        """Physical level of a line, e.g. to check what an output drives"""
+        with self._lock:
+            return self._lines[self.line_offset_from_id(line)].level
+
+    def unplug(self) -> None:
+        """Drop off the bus like an expander losing power: every call fails with ENODEV, the chip
+        and request fds turn readable and the lines forget their requests, until replug
+        """
+        with self._lock:
+            self.lost = True
+            for line in self._lines:
+                if line.request:
+                    line.request._fd.signal()
+                    line.request = None
+                    line.settings = None
+            self._info_events.clear()
+            self._info_fd.signal()
+
+    def replug(self) -> None:
+        with self._lock:
+            self.lost = False
+
+    def close(self) -> None:
+        self.stop()
+        self._info_fd.close()
+        self.closed = True
+
+
+class SimLineRequest:
+    """Line request of a SimChip, with the gpiod.LineRequest interface"""
+
+    def __init__(self, chip: SimChip, consumer: str, offsets: list[int], buffer_size: int) -> None:
+        self.chip = chip
+        self.consumer = consumer
+        self.offsets = offsets
+        self.lines = offsets
+        self._events: deque = deque(maxlen=buffer_size)
+        self._fd = SimFd()
+        self.released = False
+
+    def __repr__(self) -> str:
+        return f"<SimLineRequest chip={self.chip.path} offsets={self.offsets}>"
+
+    @property
+    def fd(self) -> int:
+        return self._fd.fd
+
+    def _queue(self, event: SimEdgeEvent) -> None:
+        # a full buffer drops the oldest event, the gap shows in line_seqno
+        self._events.append(event)
+        self._fd.signal()
+
+    def wait_edge_events(self, timeout: float | None = None) -> bool:
+        return self.chip.lost or bool(self._events)
+
+    def read_edge_events(self, max_events: int | None = None) -> list[SimEdgeEvent]:
+        with self.chip._lock:
+            self.chip._check()
+            count = len(self._events) if max_events is None else min(max_events, len(self._events))
+            events = [self._events.popleft() for _ in range(count)]
+            if not self._events:
+                self._fd.drain()
+            return events
+
+    def get_value(self, line: int | str) -> Value:
+        return self.get_values([line])[0]
+
+    def get_values(self, lines: Iterable[int | str] | None = None) -> list[Value]:
+        with self.chip._lock:
+            self.chip._check()
+            offsets = [self.chip.line_offset_from_id(line) for line in (lines if lines is not None else self.offsets)]
+            return [Value.ACTIVE if self.chip._lines[offset].value else Value.INACTIVE for offset in offsets]
+
+    def set_value(self, line: int | str, value: Value) -> None:
+        self.set_values({line: value})
+
+    def set_values(self, values: dict) -> None:
+        self.chip._set(self, {self.chip.line_offset_from_id(line): value for line, value in values.items()})
+
+    def reconfigure_lines(self, config: dict) -> None:
+        self.chip._reconfigure(self, config)
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.chip._release(self)
+        self._fd.close()
+
+
+class SimBackend:
+    """Simulated gpiochips for development, CI and benchmarks without a Raspberry Pi"""
+
+    def __init__(self, chips: Iterable[SimChip] | None = None) -> None:
+        self.chips: Dict[str, SimChip] = {chip.path: chip for chip in chips or [self.pinctrl()]}
+
+    @staticmethod
+    def pinctrl(index: int = 0, num_lines: int = 54) -> SimChip:
+        """A Raspberry Pi like chip, discovered as the default chip with GPIO0.. line names"""
+        return SimChip(f"/dev/gpiochip{index}", f"gpiochip{index}", "pinctrl-sim", num_lines,
+                       [f"GPIO{offset}" for offset in range(num_lines)])
+
+    def chip_paths(self) -> list[str]:
+        return sorted(self.chips)
+
+    def open(self, path: str) -> SimChip:
+        chip = self.chips[path]
+        chip._check()
+        if chip.closed:
+            # reopened after a close, e.g. by a second hub
+            chip._info_fd = SimFd()
+            chip.closed = False
+        return chip
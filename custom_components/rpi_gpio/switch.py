@@ -7,13 +7,16 @@ import logging
 _LOGGER = logging.getLogger(__name__)
 
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.config_validation import PLATFORM_SCHEMA
-from homeassistant.components.switch import SwitchEntity
+from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN, SwitchEntity
 from homeassistant.const import CONF_SWITCHES, CONF_NAME, CONF_PORT, CONF_UNIQUE_ID, STATE_ON
-from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.restore_state import RestoreEntity, async_get as async_get_restore_state
 from .hub import BIAS, DRIVE
+from .const import CONF_CHIP
 CONF_INVERT_LOGIC = "invert_logic"
 DEFAULT_INVERT_LOGIC = False
 CONF_PULL_MODE="pull_mode"
@@ -22,6 +25,12 @@ CONF_DRIVE ="drive"
 DEFAULT_DRIVE = "PUSH_PULL"
 CONF_PERSISTENT = "persistent"
 DEFAULT_PERSISTENT = False
+CONF_MOMENTARY = "momentary"
+DEFAULT_MOMENTARY = False
+CONF_PULSE_TIME = "pulse_time"
+DEFAULT_PULSE_TIME = 0.5
+CONF_GROUPS = "groups"
+CONF_MEMBERS = "members"
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
@@ -31,14 +40,30 @@ PLATFORM_SCHEMA = vol.All(
         vol.Exclusive(CONF_SWITCHES, CONF_SWITCHES): vol.All(
             cv.ensure_list, [{
                 vol.Required(CONF_NAME): cv.string,
-                vol.Required(CONF_PORT): cv.positive_int,
+                vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                vol.Optional(CONF_CHIP): cv.string,
                 vol.Optional(CONF_UNIQUE_ID): cv.string,
                 vol.Optional(CONF_INVERT_LOGIC, default=DEFAULT_INVERT_LOGIC): cv.boolean,
                 vol.Optional(CONF_PULL_MODE, default=DEFAULT_PULL_MODE): vol.In(BIAS.keys()),
                 vol.Optional(CONF_DRIVE, default=DEFAULT_DRIVE): vol.In(DRIVE.keys()), 
                 vol.Optional(CONF_PERSISTENT, default=DEFAULT_PERSISTENT): cv.boolean,
+                vol.Optional(CONF_MOMENTARY, default=DEFAULT_MOMENTARY): cv.boolean,
+                vol.Optional(CONF_PULSE_TIME, default=DEFAULT_PULSE_TIME): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
             }]
-        )
+        ),
+        vol.Optional(CONF_GROUPS, default=[]): vol.All(
+            cv.ensure_list, [{
+                vol.Required(CONF_NAME): cv.string,
+                vol.Required(CONF_MEMBERS): vol.All(cv.ensure_list, [vol.Any(
+                    vol.All(vol.Any(cv.positive_int, cv.string), lambda port: {CONF_PORT: port}),
+                    {
+                        vol.Required(CONF_PORT): vol.Any(cv.positive_int, cv.string),
+                        vol.Optional(CONF_CHIP): cv.string,
+                    },
+                )]),
+                vol.Optional(CONF_UNIQUE_ID): cv.string,
+            }]
+        ),
     })
 )
 
@@ -57,64 +82,169 @@ async def async_setup_platform(
     switches = []
     for switch in config.get(CONF_SWITCHES):
         try:
-            switches.append(
-                GPIODSwitch(
-                    hub,
-                    switch[CONF_NAME],
-                    switch[CONF_PORT],
-                    switch.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{switch[CONF_PORT]}_{switch[CONF_NAME].lower().replace(' ', '_')}",
-                    switch.get(CONF_INVERT_LOGIC),
-                    switch.get(CONF_PULL_MODE),
-                    switch.get(CONF_DRIVE),
-                    switch[CONF_PERSISTENT]
-                )
-            )
+            chip, port = hub.resolve_line(switch[CONF_PORT], switch.get(CONF_CHIP))
+            await hub.async_claim_port(port, chip)
+            unique_id = switch.get(CONF_UNIQUE_ID) or f"{DOMAIN}_{switch[CONF_PORT]}_{switch[CONF_NAME].lower().replace(' ', '_')}"
+            switches.append((switch, chip, port, unique_id))
         except Exception as e:
             _LOGGER.error(f"Failed to add switch {switch[CONF_NAME]} for port {switch[CONF_PORT]}: {e}")
 
-    async_add_entities(switches)
+    # restored states of all persistent switches at once, so every line is requested
+    # below with its initial value, before the entities are added
+    registry = er.async_get(hass)
+    last_states = async_get_restore_state(hass).last_states
+    initial = {}
+    for switch, chip, port, unique_id in switches:
+        if not switch[CONF_PERSISTENT] or switch[CONF_MOMENTARY]:
+            continue
+        entity_id = registry.async_get_entity_id(SWITCH_DOMAIN, DOMAIN, unique_id)
+        stored = last_states.get(entity_id) if entity_id else None
+        initial[(chip, port)] = stored is not None and stored.state.state == STATE_ON
+        _LOGGER.debug(f"restored state of port {port}: {initial[(chip, port)]}")
+
+    lines = await hub.async_add_switches(
+        (chip, port, switch.get(CONF_INVERT_LOGIC), switch.get(CONF_PULL_MODE), switch.get(CONF_DRIVE),
+         initial.get((chip, port), False))
+        for switch, chip, port, unique_id in switches)
+
+    entities = []
+    # (chip path, offset) -> switch, so members of a group resolve like switches do
+    by_key = {}
+    for switch, chip, port, unique_id in switches:
+        if (chip, port) not in lines:
+            _LOGGER.error(f"Failed to add switch {switch[CONF_NAME]} for port {switch[CONF_PORT]}: line request failed")
+            continue
+        entity = GPIODSwitch(
+            hub,
+            switch[CONF_NAME],
+            port,
+            unique_id,
+            lines[(chip, port)],
+            switch[CONF_PULSE_TIME] if switch[CONF_MOMENTARY] else None
+        )
+        by_key[(lines[(chip, port)].chip.path, port)] = entity
+        entities.append(entity)
+
+    for group in config[CONF_GROUPS]:
+        members, missing = [], []
+        for member in group[CONF_MEMBERS]:
+            try:
+                members.append(by_key[hub.output_key(member[CONF_PORT], member.get(CONF_CHIP))])
+            except (HomeAssistantError, KeyError):
+                missing.append(member[CONF_PORT])
+        if missing:
+            _LOGGER.error(f"Failed to add switch group {group[CONF_NAME]}: ports {missing} are not switches of this platform")
+            continue
+        entities.append(
+            GPIODSwitchGroup(
+                hub,
+                group[CONF_NAME],
+                group.get(CONF_UNIQUE_ID) or f"{DOMAIN}_group_{group[CONF_NAME].lower().replace(' ', '_')}",
+                members
+            )
+        )
+
+    async_add_entities(entities)
 
 
 class GPIODSwitch(SwitchEntity, RestoreEntity):
+    """Output switch, its state is saved for the restore of persistent switches at the next setup"""
     _attr_should_poll = False
 
-    def __init__(self, hub, name, port, unique_id, active_low, bias, drive, persistent):
-        _LOGGER.debug(f"GPIODSwitch init: {port} - {name} - {unique_id} - active_low: {active_low} - bias: {bias} - drive: {drive} - persistent: {persistent}")
+    def __init__(self, hub, name, port, unique_id, line, pulse_time=None):
+        _LOGGER.debug(f"GPIODSwitch init: {port} - {name} - {unique_id} - pulse_time: {pulse_time}")
         self._hub = hub
         self._attr_name = name
         self._attr_unique_id = unique_id
         self._port = port
-        self._active_low = active_low
-        self._bias = bias
-        self._drive_mode = drive
-        self._persistent = persistent
-        self._line = None
-        self._hub.verify_port_ready(self._port)
-        
+        self._line = line
+        self._pulse_time = pulse_time
+        self._groups = []
+        self._attr_is_on = False
+
+    @property
+    def output_key(self):
+        return (self._line.chip.path, self._port)
+
+    @property
+    def available(self) -> bool:
+        return self._line.online
+
+    def add_group(self, group) -> None:
+        self._groups.append(group)
+
+    def _write_groups(self) -> None:
+        for group in self._groups:
+            if group.hass:
+                group.async_write_ha_state()
+
+    def handle_output(self, value: bool) -> None:
+        """Output was set by the hub, e.g. through set_outputs"""
+        self._attr_is_on = value
+        self.async_write_ha_state()
+        self._write_groups()
+
+    def handle_availability(self) -> None:
+        self.async_write_ha_state()
+        self._write_groups()
+
     async def async_added_to_hass(self) -> None:
         """Call when the switch is added to hass."""
         await super().async_added_to_hass()
-        state = await self.async_get_last_state()
-        if not state or not self._persistent:
-            self._attr_is_on = False
-        else: 
-            _LOGGER.debug(f"setting initial persistent state for: {self._port}. state: {state.state}")
-            self._attr_is_on = True if state.state == STATE_ON else False
-            self.async_write_ha_state()
-        self._line = self._hub.add_switch(self._port, self._active_low, self._bias, self._drive_mode, self._attr_is_on)
+        # requested at setup with the restored state, a line kept over a reload may already be on
+        self._attr_is_on = self._line.values.get(self._port, False)
+        self._hub.add_output(self._line, self._port, self.handle_output)
+        self._line.listeners.append(self.handle_availability)
+        self._write_groups()
 
     async def async_will_remove_from_hass(self) -> None:
         await super().async_will_remove_from_hass()
         _LOGGER.debug(f"GPIODSwitch async_will_remove_from_hass")
-        if self._line:
-            self._line.release()
+        self._line.listeners.remove(self.handle_availability)
+        await self._hub.async_release(self._line, self._port)
 
     async def async_turn_on(self, **kwargs: Any) -> None:
-        self._hub.turn_on(self._line, self._port)
-        self._attr_is_on = True
-        self.async_write_ha_state()
+        if self._pulse_time:
+            # momentary, on for the duration of the pulse only
+            await self._hub.async_pulse_output(self.output_key, self._pulse_time)
+            return
+        await self._hub.async_turn_on(self._line, self._port)
+        self.handle_output(True)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
-        self._hub.turn_off(self._line, self._port)
-        self._attr_is_on = False
-        self.async_write_ha_state()
+        if self._pulse_time and self.is_on:
+            # the running pulse ends by itself
+            return
+        await self._hub.async_turn_off(self._line, self._port)
+        self.handle_output(False)
+
+
+class GPIODSwitchGroup(SwitchEntity):
+    """Switches of one platform driven together, one set_values ioctl per line request"""
+    _attr_should_poll = False
+
+    def __init__(self, hub, name, unique_id, members):
+        _LOGGER.debug(f"GPIODSwitchGroup init: {name} - {unique_id} - members: {[member._port for member in members]}")
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._members = members
+        for member in members:
+            member.add_group(self)
+
+    @property
+    def available(self) -> bool:
+        return all(member.available for member in self._members)
+
+    @property
+    def is_on(self) -> bool:
+        return any(member.is_on for member in self._members)
+
+    async def _async_set(self, value: bool) -> None:
+        await self._hub.async_set_outputs({member.output_key: value for member in self._members})
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        await self._async_set(True)
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        await self._async_set(False)
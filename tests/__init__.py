@@ -0,0 +1 @@
+"""Tests of the rpi_gpio integration, run on simulated gpio chips."""
@@ -0,0 +1,48 @@
+"""Helpers of the simulator tests."""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import time
+from typing import Callable
+
+import yaml
+
+SIM_CHIP = "/dev/gpiochip0"
+
+
+def write_config(config_dir: Path, config: dict) -> Path:
+    """Write configuration.yaml, the reload service reads it again"""
+    path = config_dir / "configuration.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return path
+
+
+def sim_chip(hass, path: str = SIM_CHIP):
+    return hass.data["rpi_gpio"]._backend.chips[path]
+
+
+def state(hass, entity_id: str) -> str | None:
+    current = hass.states.get(entity_id)
+    return current.state if current else None
+
+
+async def async_wait_for(condition: Callable[[], bool], timeout: float = 2) -> None:
+    """Wait until condition() holds, edges reach the entities through the reader threads"""
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError(f"timed out after {timeout} s")
+        await asyncio.sleep(0.01)
+
+
+def track_states(hass, entity_id: str) -> list:
+    """States entity_id changes to from now on, in order"""
+    states = []
+
+    def changed(event) -> None:
+        if event.data["entity_id"] == entity_id and event.data["new_state"]:
+            states.append(event.data["new_state"].state)
+
+    hass.bus.async_listen("state_changed", changed)
+    return states
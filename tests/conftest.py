@@ -0,0 +1,58 @@
+"""Fixtures booting Home Assistant with the integration on simulated gpio chips."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+import inspect
+from pathlib import Path
+
+from homeassistant import bootstrap, core, loader
+from homeassistant.util.yaml import load_yaml
+import pytest
+
+from .common import write_config
+
+COMPONENT = Path(__file__).parent.parent / "custom_components" / "rpi_gpio"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run async tests on an event loop of their own, no asyncio plugin needed"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    args = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**args))
+    return True
+
+
+@pytest.fixture
+def config_dir(tmp_path: Path) -> Path:
+    """Home Assistant config dir with the integration as a custom component"""
+    (tmp_path / "custom_components").mkdir()
+    (tmp_path / "custom_components" / "rpi_gpio").symlink_to(COMPONENT, target_is_directory=True)
+    return tmp_path
+
+
+@pytest.fixture
+def start(config_dir: Path):
+    """start(config) boots Home Assistant from config written to configuration.yaml"""
+    @asynccontextmanager
+    async def async_start(config: dict):
+        path = write_config(config_dir, {"homeassistant": {}, **config})
+        hass = core.HomeAssistant(str(config_dir))
+        hass.config.skip_pip = True
+        loader.async_setup(hass)
+        await bootstrap.async_from_config_dict(load_yaml(path), hass)
+        # started like a real boot, so stopping runs the shutdown and saves the restore states
+        await hass.async_start()
+        await hass.async_block_till_done()
+        try:
+            # a platform failing to set up only logs an error, fail the test instead
+            platforms = [f"rpi_gpio.{domain}" for domain in config if domain not in ("homeassistant", "rpi_gpio")]
+            failed = [name for name in ["rpi_gpio", *platforms] if name not in hass.config.components]
+            assert not failed, f"set up failed: {failed}"
+            yield hass
+        finally:
+            await hass.async_stop()
+
+    return async_start
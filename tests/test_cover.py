@@ -0,0 +1,71 @@
+"""Cover position from the limit pins and the travel time."""
+import asyncio
+
+from .common import async_wait_for, sim_chip, state
+
+
+def position(hass, entity_id: str):
+    return hass.states.get(entity_id).attributes.get("current_position")
+
+
+async def test_travel_time_estimate(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "cover": [{"platform": "rpi_gpio", "relay_time": 0.05, "position_interval": 0.1, "covers": [
+            {"name": "gate", "relay_pin": 17, "state_pin": 5, "travel_time": 1}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        assert state(hass, "cover.gate") == "closed" and position(hass, "cover.gate") == 0
+        await hass.services.async_call("cover", "open_cover", {"entity_id": "cover.gate"}, blocking=True)
+        chip.set_input(5, False)
+        await asyncio.sleep(0.5)
+        # still moving after the relay pulse, the estimate follows the travel time
+        assert state(hass, "cover.gate") == "opening"
+        assert 25 <= position(hass, "cover.gate") <= 75
+        # without an open limit pin the cover is open once the travel time is over
+        await async_wait_for(lambda: state(hass, "cover.gate") == "open")
+        assert position(hass, "cover.gate") == 100
+        assert hass.data["cover"].get_entity("cover.gate")._tracker._unsub is None
+
+        await hass.services.async_call("cover", "close_cover", {"entity_id": "cover.gate"}, blocking=True)
+        await asyncio.sleep(0.3)
+        await hass.services.async_call("cover", "stop_cover", {"entity_id": "cover.gate"}, blocking=True)
+        stopped = position(hass, "cover.gate")
+        assert state(hass, "cover.gate") == "open" and 55 <= stopped <= 85
+        await asyncio.sleep(0.2)
+        assert position(hass, "cover.gate") == stopped
+
+
+async def test_limit_pins_and_shared_timer(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "cover": [{"platform": "rpi_gpio", "state_pull_mode": "DOWN", "position_interval": 0.1, "covers": [
+            {"name": "door", "relay_pin": 17, "state_pin": 5, "open_pin": 6, "travel_time": 1},
+            {"name": "side", "relay_pin": 18, "state_pin": 7, "open_pin": 8, "travel_time": 1}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        door, side = (hass.data["cover"].get_entity(entity_id) for entity_id in ("cover.door", "cover.side"))
+        # between the limits the position is unknown
+        assert position(hass, "cover.door") is None
+        chip.set_input(6, True)
+        chip.set_input(8, True)
+        await async_wait_for(lambda: position(hass, "cover.door") == position(hass, "cover.side") == 100)
+        # released by a remote, the motion starts at the edge of the open limit pin
+        chip.set_input(6, False)
+        chip.set_input(8, False)
+        await async_wait_for(lambda: state(hass, "cover.door") == state(hass, "cover.side") == "closing")
+        # one timer moves every cover of the platform
+        tracker = door._tracker
+        assert side._tracker is tracker and tracker._covers == {door, side}
+        await asyncio.sleep(0.5)
+        assert 25 <= position(hass, "cover.door") <= 75
+        # the estimate waits at 1 for the closed limit pin
+        await async_wait_for(lambda: position(hass, "cover.door") == 1)
+        assert state(hass, "cover.door") == "closing"
+        chip.set_input(5, True)
+        await async_wait_for(lambda: state(hass, "cover.door") == "closed")
+        assert position(hass, "cover.door") == 0
+        assert tracker._covers == {side} and tracker._unsub is not None
+        chip.set_input(7, True)
+        await async_wait_for(lambda: state(hass, "cover.side") == "closed")
+        assert tracker._unsub is None
@@ -0,0 +1,154 @@
+"""Timer wheel and glitch filter, driven by a fake clock."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.rpi_gpio import debounce
+from custom_components.rpi_gpio.debounce import EdgeFilter, TimerWheel, WHEEL_SLOTS, WHEEL_TICK_MS
+
+TICK = WHEEL_TICK_MS * 1_000_000
+
+
+class FakeTimer:
+    def __init__(self, loop, when, callback):
+        self.loop = loop
+        self.when = when
+        self.callback = callback
+
+    def cancel(self):
+        if self.loop.timer is self:
+            self.loop.timer = None
+
+
+class FakeLoop:
+    """call_later on a clock that only moves in run_until"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.timer = None
+
+    def call_later(self, delay, callback):
+        self.timer = FakeTimer(self, self.clock.now + int(delay * 1e9), callback)
+        return self.timer
+
+    def run_until(self, end_ns):
+        while self.timer and self.timer.when <= end_ns:
+            timer, self.timer = self.timer, None
+            self.clock.now = timer.when
+            timer.callback()
+        self.clock.now = end_ns
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time_ns(self):
+        return self.now
+
+
+class FakeHass:
+    def __init__(self, loop):
+        self.loop = loop
+
+
+class Item:
+    def __init__(self, clock):
+        self.clock = clock
+        self.slot = None
+        self.deadline = 0
+        self.expired_at = None
+
+    def expire(self):
+        self.expired_at = self.clock.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1_700_000_000 * 1_000_000_000)
+    monkeypatch.setattr(debounce.time, "time_ns", clock.time_ns)
+    return clock
+
+
+@pytest.fixture
+def loop(clock):
+    return FakeLoop(clock)
+
+
+@pytest.fixture
+def wheel(loop):
+    return TimerWheel(FakeHass(loop))
+
+
+@pytest.mark.parametrize("phase_ms", [0, 1, 2.5, 4, 4.9])
+@pytest.mark.parametrize("delay_ms", [0.5, 3, 20, 1000])
+def test_deadline_fires_within_a_tick(clock, loop, wheel, phase_ms, delay_ms):
+    clock.now += int(phase_ms * 1_000_000)
+    item = Item(clock)
+    deadline = clock.now + int(delay_ms * 1_000_000)
+    wheel.schedule(item, deadline)
+    loop.run_until(deadline + 10 * TICK)
+    assert item.expired_at is not None
+    assert deadline <= item.expired_at <= deadline + TICK
+
+
+def test_deadline_beyond_one_rotation(clock, loop, wheel):
+    item = Item(clock)
+    deadline = clock.now + (WHEEL_SLOTS + 3) * TICK + 1
+    wheel.schedule(item, deadline)
+    loop.run_until(deadline - 1)
+    assert item.expired_at is None
+    loop.run_until(deadline + 2 * TICK)
+    assert deadline <= item.expired_at <= deadline + TICK
+
+
+def test_past_deadline_fires_on_next_tick(clock, loop, wheel):
+    item = Item(clock)
+    start = clock.now
+    wheel.schedule(item, start - 50 * TICK)
+    loop.run_until(start + 2 * TICK)
+    assert start < item.expired_at <= start + TICK
+
+
+def test_cancel_and_timer_stops_when_empty(clock, loop, wheel):
+    item = Item(clock)
+    wheel.schedule(item, clock.now + 4 * TICK)
+    wheel.cancel(item)
+    loop.run_until(clock.now + 10 * TICK)
+    assert item.expired_at is None
+    assert loop.timer is None
+
+
+class Edge:
+    def __init__(self, rising, timestamp_ns):
+        self.event_type = debounce.EventType.RISING_EDGE if rising else debounce.EventType.FALLING_EDGE
+        self.timestamp_ns = timestamp_ns
+
+
+def test_stable_filter_settles_every_press(clock, loop, wheel):
+    """Each press settles filter_time after its last bounce, never a wheel rotation later"""
+    reports = []
+    edge_filter = EdgeFilter(wheel, lambda event, count: reports.append((event.timestamp_ns, clock.now, count)),
+                             debounce.FILTER_STABLE, 20)
+    for press in range(20):
+        start = clock.now + 137_000 * press
+        for bounce, rising in enumerate((True, False, True)):
+            clock.now = start + bounce * 300_000
+            edge_filter.feed(Edge(rising, clock.now))
+        loop.run_until(clock.now + 100_000_000)
+        clock.now += 100_000_000
+        edge_filter.feed(Edge(False, clock.now))
+        loop.run_until(clock.now + 100_000_000)
+    assert len(reports) == 40
+    for timestamp, reported_at, count in reports:
+        assert 20_000_000 <= reported_at - timestamp <= 20_000_000 + TICK
+
+
+def test_glitch_shorter_than_filter_time_is_dropped(clock, loop, wheel):
+    reports = []
+    edge_filter = EdgeFilter(wheel, lambda event, count: reports.append(event), debounce.FILTER_STABLE, 20)
+    edge_filter.feed(Edge(True, clock.now))
+    clock.now += 5_000_000
+    edge_filter.feed(Edge(False, clock.now))
+    loop.run_until(clock.now + 100_000_000)
+    assert reports == []
@@ -0,0 +1,59 @@
+"""Diagnostics action and sensors."""
+from .common import async_wait_for, sim_chip, state
+
+
+async def test_diagnostic_sensors_once_per_hub(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": "b", "port": 5}]}],
+        "sensor": [
+            {"platform": "rpi_gpio", "diagnostics": True, "sensors": [{"name": "c1", "port": 6}]},
+            {"platform": "rpi_gpio", "diagnostics": True, "sensors": [{"name": "c2", "port": 7}]},
+        ],
+    }) as hass:
+        diagnostic = [entity_id for entity_id in hass.states.async_entity_ids("sensor") if entity_id.startswith("sensor.gpio_")]
+        assert len(diagnostic) == 6
+        await async_wait_for(lambda: state(hass, "sensor.gpio_events") == "0")
+        sim_chip(hass).inject(5, 3)
+        await async_wait_for(lambda: state(hass, "binary_sensor.b") == "off")
+        await hass.data["rpi_gpio"].diagnostic_sensors.async_publish()
+        assert state(hass, "sensor.gpio_events") == "3"
+        assert state(hass, "sensor.gpio_dropped_events") == "0"
+
+
+async def test_latency_of_immediate_edges_only(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [
+            {"name": "plain", "port": 5},
+            {"name": "coalesced", "port": 6, "coalesce_time": 20},
+            {"name": "filtered", "port": 7, "filter_mode": "stable", "filter_time": 10},
+        ]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        hub = hass.data["rpi_gpio"]
+        chip.set_input(6, False)
+        chip.set_input(7, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.coalesced") == state(hass, "binary_sensor.filtered") == "off")
+        assert hub.stats.as_dict()["latency_samples"] == 0
+        chip.set_input(5, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.plain") == "off")
+        assert hub.stats.as_dict()["latency_samples"] == 1
+
+
+async def test_get_diagnostics(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": "b", "port": 5}]}],
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "r", "port": 22}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        chip.inject(5, 2)
+        await async_wait_for(lambda: hass.data["rpi_gpio"].stats.totals()["events"] == 2)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r"}, blocking=True)
+        response = await hass.services.async_call("rpi_gpio", "get_diagnostics", {}, blocking=True, return_response=True)
+        assert response["chips"][chip.path]["ports"] == [5, 22]
+        assert response["chips"][chip.path]["lines_in_use"] == {5: "rpi_gpio", 22: "rpi_gpio"}
+        assert response["lines"]["gpiochip0:5"]["events"] == 2
+        assert response["lines"]["gpiochip0:22"]["set_value_calls"] == 1
+        assert response["counters"]["events"] == 2
@@ -0,0 +1,59 @@
+"""Edge history ring and the get_history action."""
+from homeassistant.exceptions import ServiceValidationError
+import pytest
+
+from custom_components.rpi_gpio.history import DUMP_HEADER, DUMP_MAGIC, DUMP_RECORD, DUMP_VERSION, EdgeHistory
+
+from .common import async_wait_for, sim_chip
+
+
+def test_ring_keeps_last_edges():
+    history = EdgeHistory(4)
+    assert history.events() == []
+    for n in range(6):
+        history.append(1000 + n, n % 2 == 0, n + 1)
+    assert len(history) == 4 and history.total == 6
+    assert history.events() == [(1002, True, 3), (1003, False, 4), (1004, True, 5), (1005, False, 6)]
+    assert history.events(1003, 1004) == [(1003, False, 4), (1004, True, 5)]
+
+
+async def test_get_history(start, config_dir):
+    async with start({
+        "homeassistant": {"allowlist_external_dirs": [str(config_dir)]},
+        "rpi_gpio": {"simulator": True, "history_size": 8},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": "contact", "port": 5}]}],
+    }) as hass:
+        sim_chip(hass).inject(5, 10)
+        await async_wait_for(lambda: hass.data["rpi_gpio"].history[("/dev/gpiochip0", 5)].total == 10)
+        response = await hass.services.async_call(
+            "rpi_gpio", "get_history", {"port": 5}, blocking=True, return_response=True)
+        assert response["recorded"] == 10
+        events = response["events"]
+        # the ring holds the last history_size edges, oldest first
+        assert [event["seqno"] for event in events] == list(range(3, 11))
+        # the pulled up input starts high, odd edges fall
+        assert [event["edge"] for event in events] == ["falling", "rising"] * 4
+        assert sorted(event["timestamp_ns"] for event in events) == [event["timestamp_ns"] for event in events]
+
+        window = {"start": events[2]["timestamp"], "end": events[4]["timestamp"]}
+        response = await hass.services.async_call(
+            "rpi_gpio", "get_history", {"port": 5, **window}, blocking=True, return_response=True)
+        # datetimes are rounded to microseconds, the injected edges are 1 us apart
+        assert 2 <= len(response["events"]) <= 4
+
+        path = config_dir / "contact.bin"
+        response = await hass.services.async_call(
+            "rpi_gpio", "get_history", {"port": 5, "file": str(path)}, blocking=True, return_response=True)
+        assert response["file"] == str(path)
+        data = path.read_bytes()
+        assert DUMP_HEADER.unpack_from(data) == (DUMP_MAGIC, DUMP_VERSION, 5, 8)
+        records = list(DUMP_RECORD.iter_unpack(data[DUMP_HEADER.size:]))
+        assert [(timestamp, seqno, edge == 1) for timestamp, seqno, edge in records] == \
+            [(event["timestamp_ns"], event["seqno"], event["edge"] == "rising") for event in events]
+
+        with pytest.raises(ServiceValidationError):
+            await hass.services.async_call(
+                "rpi_gpio", "get_history", {"port": 5, "file": "/etc/contact.bin"}, blocking=True, return_response=True)
+        with pytest.raises(ServiceValidationError):
+            await hass.services.async_call(
+                "rpi_gpio", "get_history", {"port": 9}, blocking=True, return_response=True)
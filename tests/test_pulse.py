@@ -0,0 +1,120 @@
+"""Pulse scheduler and the pulse action."""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from homeassistant.exceptions import HomeAssistantError
+import pytest
+
+from custom_components.rpi_gpio.pulse import Pulse, PulseScheduler
+
+from .common import sim_chip
+
+LINE = SimpleNamespace(chip=SimpleNamespace(path="/dev/gpiochip0"))
+
+
+class Recorder:
+    """begin / end of a PulseScheduler, records the active ports"""
+
+    def __init__(self) -> None:
+        self.active = set()
+        self.log = []
+
+    def begin(self, pulse: Pulse) -> None:
+        pulse.start = time.monotonic_ns()
+        self.active.add(pulse.port)
+        self.log.append(("begin", pulse.port))
+
+    def end(self, pulse: Pulse) -> None:
+        pulse.measured = time.monotonic_ns() - pulse.start
+        self.active.discard(pulse.port)
+        self.log.append(("end", pulse.port))
+
+
+def submit(scheduler: PulseScheduler, port: int, width_s: float) -> threading.Event:
+    done = threading.Event()
+    pulse = Pulse(LINE, port, int(width_s * 1e9), lambda pulse: done.set())
+    done.pulse = pulse
+    scheduler.submit(pulse)
+    return done
+
+
+@pytest.fixture
+def scheduler():
+    recorder = Recorder()
+    scheduler = PulseScheduler(recorder.begin, recorder.end)
+    scheduler.recorder = recorder
+    yield scheduler
+    scheduler.stop()
+
+
+def test_long_pulse_does_not_delay_others(scheduler):
+    long = submit(scheduler, 1, 1)
+    short = submit(scheduler, 2, 0.05)
+    assert short.wait(0.5)
+    assert not long.is_set()
+    assert 50_000_000 <= short.pulse.measured < 100_000_000
+    assert scheduler.recorder.active == {1}
+
+
+def test_pulses_of_a_port_run_in_turn(scheduler):
+    first = submit(scheduler, 1, 0.05)
+    second = submit(scheduler, 1, 0.05)
+    assert second.wait(1)
+    assert first.is_set()
+    assert scheduler.recorder.log == [("begin", 1), ("end", 1), ("begin", 1), ("end", 1)]
+    assert second.pulse.start - first.pulse.start >= 50_000_000
+
+
+def test_stop_ends_pulses_in_flight(scheduler):
+    running = submit(scheduler, 1, 0.5)
+    waiting = submit(scheduler, 1, 0.5)
+    time.sleep(0.05)
+    scheduler.stop()
+    assert scheduler.recorder.active == set()
+    assert running.is_set() and waiting.is_set()
+    assert isinstance(running.pulse.error, HomeAssistantError)
+    assert isinstance(waiting.pulse.error, HomeAssistantError)
+    assert scheduler.recorder.log == [("begin", 1), ("end", 1)]
+    with pytest.raises(HomeAssistantError):
+        submit(scheduler, 2, 0.1)
+
+
+async def test_pulse_action(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "r1", "port": 22}, {"name": "r2", "port": 23}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+
+        async def pulse(port: int, duration: float) -> float:
+            response = await hass.services.async_call(
+                "rpi_gpio", "pulse", {"port": port, "duration": duration}, blocking=True, return_response=True)
+            return response["width"]
+
+        long = asyncio.ensure_future(pulse(22, 0.5))
+        await asyncio.sleep(0.05)
+        assert chip.level(22)
+        assert 0.05 <= await pulse(23, 0.05) < 0.1
+        assert chip.level(22) and not long.done()
+        assert 0.5 <= await long < 0.55
+        assert not chip.level(22)
+        pulses = hass.data["rpi_gpio"].diagnostics()["pulses"]
+        assert pulses["gpiochip0:22"]["count"] == pulses["gpiochip0:23"]["count"] == 1
+
+
+async def test_stop_ends_pulse(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "gate", "port": 22}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        pulse = hass.async_create_task(hass.services.async_call(
+            "rpi_gpio", "pulse", {"port": 22, "duration": 5}, blocking=True))
+        await asyncio.sleep(0.05)
+        assert chip.level(22)
+        hass.data["rpi_gpio"].pulser.stop()
+        assert not chip.level(22)
+        with pytest.raises(HomeAssistantError):
+            await asyncio.wait_for(pulse, 1)
@@ -0,0 +1,139 @@
+"""Software PWM scheduler and the light and fan platforms."""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from gpiod.line import Value
+from homeassistant.components.fan import FanEntityFeature
+import pytest
+
+from custom_components.rpi_gpio.pwm import PwmScheduler
+
+from .common import sim_chip, state
+
+
+class Request:
+    """set_values of a line request, records (monotonic ns, values) of every call"""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def set_values(self, values: dict) -> None:
+        self.calls.append((time.monotonic_ns(), {port: value == Value.ACTIVE for port, value in values.items()}))
+
+    def duty(self, port: int, start_ns: int, end_ns: int) -> float:
+        """Fraction of [start, end) port was active"""
+        level, since, active = False, start_ns, 0
+        for timestamp, values in self.calls:
+            if port not in values:
+                continue
+            timestamp = min(max(timestamp, start_ns), end_ns)
+            if level:
+                active += timestamp - since
+            level, since = values[port], timestamp
+        if level:
+            active += end_ns - since
+        return active / (end_ns - start_ns)
+
+
+@pytest.fixture
+def pwm():
+    scheduler = PwmScheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+class Line:
+    """LineGroup as seen by the scheduler"""
+
+    def __init__(self, request: Request) -> None:
+        self.request = request
+        self.chip = SimpleNamespace(path="/dev/gpiochip0")
+
+
+def test_duty_cycle(pwm):
+    request = Request()
+    channel = pwm.add(Line(request), 1, 100)
+    pwm.set_duty(channel, 0.25)
+    start = time.monotonic_ns()
+    time.sleep(0.5)
+    assert abs(request.duty(1, start + 20_000_000, time.monotonic_ns()) - 0.25) < 0.05
+    stats = pwm.as_dict()
+    assert stats["active"] == 1 and stats["errors"] == 0
+
+
+def test_channels_share_calls_and_thread(pwm):
+    request = Request()
+    shared = Line(request)
+    channels = [pwm.add(shared, port, 50) for port in range(8)]
+    for port, channel in enumerate(channels):
+        pwm.set_duty(channel, (port + 2) / 12)
+    time.sleep(0.5)
+    assert len([thread for thread in threading.enumerate() if thread.name == "rpi_gpio_pwm"]) == 1
+    # channels of a frequency are phase aligned, their rising edges share one set_values
+    levels, rising = {}, []
+    for _, values in request.calls:
+        rose = {port for port, value in values.items() if value and not levels.get(port)}
+        levels.update(values)
+        if rose:
+            rising.append(rose)
+    # an overrun of a loaded runner may skip a cycle of a channel
+    assert len(rising) > 15
+    assert sum(len(rose) == 8 for rose in rising) >= 0.9 * len(rising)
+    for channel in channels:
+        pwm.set_duty(channel, 0)
+    time.sleep(0.02)
+    assert request.calls[-1][1] == {port: False for port in range(8)}
+    # static levels leave the thread idle
+    ticks = pwm.ticks
+    time.sleep(0.05)
+    assert pwm.ticks == ticks
+
+
+def test_remove_stops_writes(pwm):
+    request = Request()
+    channel = pwm.add(Line(request), 1, 500)
+    pwm.set_duty(channel, 0.5)
+    time.sleep(0.05)
+    pwm.remove(channel)
+    calls = len(request.calls)
+    time.sleep(0.05)
+    assert len(request.calls) == calls
+
+
+async def test_light(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "light": [{"platform": "rpi_gpio", "frequency": 100, "lights": [{"name": "strip", "port": 12}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("light", "turn_on", {"entity_id": "light.strip", "brightness": 255}, blocking=True)
+        await asyncio.sleep(0.02)
+        assert chip.level(12)
+        await hass.services.async_call("light", "turn_on", {"entity_id": "light.strip", "brightness": 128}, blocking=True)
+        levels = set()
+        for _ in range(30):
+            await asyncio.sleep(0.003)
+            levels.add(chip.level(12))
+        assert levels == {True, False}
+        assert hass.data["rpi_gpio"].diagnostics()["pwm"]["active"] == 1
+        await hass.services.async_call("light", "turn_off", {"entity_id": "light.strip"}, blocking=True)
+        await asyncio.sleep(0.02)
+        assert not chip.level(12)
+        assert state(hass, "light.strip") == "off"
+
+
+@pytest.mark.skipif(not hasattr(FanEntityFeature, "TURN_ON"), reason="Home Assistant older than hacs.json")
+async def test_fan(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "fan": [{"platform": "rpi_gpio", "fans": [{"name": "vent", "port": 13}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("fan", "turn_on", {"entity_id": "fan.vent", "percentage": 100}, blocking=True)
+        await asyncio.sleep(0.02)
+        assert chip.level(13)
+        await hass.services.async_call("fan", "turn_off", {"entity_id": "fan.vent"}, blocking=True)
+        await asyncio.sleep(0.02)
+        assert not chip.level(13)
@@ -0,0 +1,44 @@
+"""A chip dropping off the bus and coming back."""
+from homeassistant.exceptions import HomeAssistantError
+import pytest
+
+from custom_components.rpi_gpio import hub as hub_module
+
+from .common import async_wait_for, sim_chip, state
+
+ENTITIES = ["binary_sensor.button", "switch.r1"]
+
+
+@pytest.fixture
+def fast_recovery(monkeypatch):
+    monkeypatch.setattr(hub_module, "RECOVERY_DELAY", 0.05)
+
+
+async def test_chip_loss_and_recovery(start, fast_recovery):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": "button", "port": 17}]}],
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "r1", "port": 22}]}],
+    }) as hass:
+        hub = hass.data["rpi_gpio"]
+        chip = sim_chip(hass)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r1"}, blocking=True)
+
+        chip.unplug()
+        await async_wait_for(lambda: all(state(hass, entity) == "unavailable" for entity in ENTITIES))
+        assert hub.diagnostics()["chips"][chip.path]["offline_ports"] == [17, 22]
+        with pytest.raises(HomeAssistantError):
+            await hub.async_set_outputs({(chip.path, 22): False})
+
+        # the button is pressed while the chip is away, its level is read again on recovery
+        chip.set_input(17, False)
+        chip.replug()
+        await async_wait_for(lambda: state(hass, "switch.r1") == "on")
+        assert state(hass, "binary_sensor.button") == "off"
+        assert chip.level(22)
+        assert hub.diagnostics()["chips"][chip.path]["offline_ports"] == []
+
+        chip.set_input(17, True)
+        await async_wait_for(lambda: state(hass, "binary_sensor.button") == "on")
+        await hass.services.async_call("switch", "turn_off", {"entity_id": "switch.r1"}, blocking=True)
+        assert not chip.level(22)
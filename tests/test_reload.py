@@ -0,0 +1,61 @@
+"""Reloading the platforms keeps unchanged lines and frees removed ones."""
+from gpiod.line import Direction
+
+from .common import async_wait_for, sim_chip, state, write_config
+
+
+def config(sensors, switches) -> dict:
+    return {
+        "homeassistant": {},
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": f"s{port}", "port": port} for port in sensors]}],
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": f"r{port}", "port": port} for port in switches]}],
+    }
+
+
+async def reload(hass, config_dir, sensors, switches) -> None:
+    write_config(config_dir, config(sensors, switches))
+    await hass.services.async_call("rpi_gpio", "reload", {}, blocking=True)
+    await hass.async_block_till_done()
+
+
+async def test_reload(start, config_dir):
+    async with start(config([5, 6], [22, 23])) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r22"}, blocking=True)
+        outputs = chip._lines[22].request
+
+        await reload(hass, config_dir, [5], [22])
+        # a removed input is free for other consumers, the others keep their level
+        assert chip.get_line_info(6).consumer is None
+        assert chip.level(22)
+        # a removed output is held as an input in the request of the outputs, never released
+        assert chip._lines[22].request is outputs
+        assert chip._lines[23].request is outputs
+        assert chip.get_line_info(23).direction == Direction.INPUT
+        assert state(hass, "switch.r22") == "on"
+        chip.set_input(5, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.s5") == "off")
+
+        await reload(hass, config_dir, [5, 6], [22, 23])
+        assert chip.get_line_info(6).consumer == "rpi_gpio"
+        assert chip.level(22)
+        chip.set_input(6, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.s6") == "off")
+        assert chip._lines[23].request is outputs
+        assert chip.get_line_info(23).direction == Direction.OUTPUT
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r23"}, blocking=True)
+        assert chip.level(23)
+
+
+async def test_held_output_becomes_input(start, config_dir):
+    async with start(config([5], [22, 23])) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r22"}, blocking=True)
+        await reload(hass, config_dir, [5], [22])
+        await reload(hass, config_dir, [5, 23], [22])
+        assert chip.level(22)
+        chip.set_input(23, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.s23") == "off")
+        chip.set_input(23, True)
+        await async_wait_for(lambda: state(hass, "binary_sensor.s23") == "on")
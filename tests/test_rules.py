@@ -0,0 +1,79 @@
+"""Local rules and interlocks."""
+import pytest
+from homeassistant.exceptions import ServiceValidationError
+
+from .common import async_wait_for, sim_chip, state
+
+CONFIG = {
+    "rpi_gpio": {
+        "simulator": True,
+        "rules": [
+            {"input": 17, "output": 22, "action": "toggle", "edge": "FALLING"},
+            {"input": "GPIO27", "output": 23, "action": "follow"},
+        ],
+        "interlocks": [{"ports": [22, {"port": "GPIO23"}], "chip": "gpiochip0"}],
+    },
+    "binary_sensor": [{"platform": "rpi_gpio", "sensors": [
+        {"name": "button", "port": 17}, {"name": "level", "port": 27, "pull_mode": "DOWN"}]}],
+    "switch": [{"platform": "rpi_gpio", "switches": [{"name": "r1", "port": 22}, {"name": "r2", "port": 23}],
+                "groups": [{"name": "g", "members": [22, 23]}]}],
+}
+
+
+async def test_toggle_and_follow(start):
+    async with start(CONFIG) as hass:
+        chip = sim_chip(hass)
+        chip.set_input(17, False)
+        await async_wait_for(lambda: chip.level(22))
+        chip.set_input(17, True)
+        await async_wait_for(lambda: state(hass, "binary_sensor.button") == "off")
+        assert chip.level(22)
+        assert state(hass, "switch.r1") == "on"
+        # a press and release read in one batch toggles once
+        chip.set_input(17, False)
+        chip.set_input(17, True)
+        await async_wait_for(lambda: not chip.level(22))
+        assert state(hass, "switch.r1") == "off"
+        chip.set_input(27, True)
+        await async_wait_for(lambda: chip.level(23))
+        chip.set_input(27, False)
+        await async_wait_for(lambda: not chip.level(23))
+
+
+async def test_interlock(start):
+    async with start(CONFIG) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r1"}, blocking=True)
+        # the follow rule turns r1 off before r2 goes on
+        chip.set_input(27, True)
+        await async_wait_for(lambda: chip.level(23))
+        assert not chip.level(22)
+        assert state(hass, "switch.r1") == "off"
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.r1"}, blocking=True)
+        assert (chip.level(22), chip.level(23)) == (True, False)
+        with pytest.raises(ServiceValidationError):
+            await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.g"}, blocking=True)
+        with pytest.raises(ServiceValidationError):
+            await hass.services.async_call("rpi_gpio", "set_outputs", {"outputs": {22: True, 23: True}}, blocking=True)
+        assert (chip.level(22), chip.level(23)) == (True, False)
+
+
+async def test_toggle_behind_glitch_filter(start):
+    async with start({
+        "rpi_gpio": {"simulator": True, "rules": [{"input": 5, "output": 22, "action": "toggle"}]},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [
+            {"name": "button", "port": 5, "pull_mode": "DOWN", "filter_mode": "stable", "filter_time": 20}]}],
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "relay", "port": 22}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        # a bouncing press and release, each settles after filter_time
+        chip.inject(5, 5)
+        await async_wait_for(lambda: state(hass, "binary_sensor.button") == "on")
+        assert chip.level(22)
+        chip.inject(5, 5)
+        await async_wait_for(lambda: state(hass, "binary_sensor.button") == "off")
+        assert chip.level(22)
+        assert state(hass, "switch.relay") == "on"
+        chip.inject(5, 3)
+        await async_wait_for(lambda: state(hass, "binary_sensor.button") == "on")
+        assert not chip.level(22)
@@ -0,0 +1,112 @@
+"""Inputs: glitch filter and polling of chips without edge detection."""
+import asyncio
+
+from homeassistant.setup import async_setup_component
+import pytest
+
+from custom_components.rpi_gpio import hub as hub_module
+
+from .common import async_wait_for, sim_chip, state, track_states
+
+
+async def test_glitch_filter(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [
+            {"name": "filtered", "port": 5, "filter_mode": "stable", "filter_time": 20}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        states = track_states(hass, "binary_sensor.filtered")
+        assert state(hass, "binary_sensor.filtered") == "on"
+        # bounces and a glitch shorter than filter_time never reach the entity
+        chip.inject(5, 10)
+        chip.set_input(5, False)
+        chip.set_input(5, True)
+        await asyncio.sleep(0.1)
+        assert states == []
+        # a level held longer than filter_time is reported once
+        chip.set_input(5, False)
+        await async_wait_for(lambda: states == ["off"])
+        await asyncio.sleep(0.05)
+        assert states == ["off"]
+
+
+async def test_burst_read_at_once(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "sensors": [{"name": "a", "port": 5}, {"name": "b", "port": 6}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        states = track_states(hass, "binary_sensor.a")
+        # queued before the reader runs, each port gets its last edge once per read
+        chip.inject(5, 9)
+        chip.inject(6, 2)
+        await async_wait_for(lambda: states == ["off"])
+        chip.inject(5, 3)
+        await async_wait_for(lambda: states == ["off", "on"])
+        assert state(hass, "binary_sensor.b") == "on"
+        assert hass.data["rpi_gpio"].stats.totals()["events"] == 14
+
+
+async def test_coalesce_chatter(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "binary_sensor": [{"platform": "rpi_gpio", "coalesce_time": 200, "sensors": [{"name": "contact", "port": 5}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        writes = []
+
+        def changed(event) -> None:
+            if event.data["entity_id"] == "binary_sensor.contact":
+                new = event.data["new_state"]
+                writes.append((new.state, new.attributes["coalesced_edges"]))
+
+        hass.bus.async_listen("state_changed", changed)
+        # the leading edge of a quiet line is written right away
+        chip.set_input(5, False)
+        await async_wait_for(lambda: writes == [("off", 1)])
+        # chatter read over several reads within the window, folded into one write at its end
+        for level in (True, False, True):
+            await asyncio.sleep(0.01)
+            chip.set_input(5, level)
+        await asyncio.sleep(0.02)
+        assert writes == [("off", 1)]
+        await async_wait_for(lambda: writes == [("off", 1), ("on", 3)])
+        # quiet for a window, the next edge is written right away again
+        await asyncio.sleep(0.45)
+        chip.set_input(5, False)
+        await async_wait_for(lambda: writes[-1] == ("off", 1))
+        assert len(writes) == 3
+
+
+@pytest.fixture
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(hub_module, "POLL_FALLBACK_INTERVAL", 10)
+
+
+async def test_polling_fallback(start, fast_poll):
+    async with start({"rpi_gpio": {"simulator": True}}) as hass:
+        chip = sim_chip(hass)
+        chip.edge_detection = False
+        assert await async_setup_component(hass, "binary_sensor", {"binary_sensor": [
+            {"platform": "rpi_gpio", "sensors": [{"name": "polled", "port": 5}]}]})
+        assert await async_setup_component(hass, "sensor", {"sensor": [
+            {"platform": "rpi_gpio", "update_interval": 1, "sensors": [
+                {"name": "count", "port": 6, "pull_mode": "DOWN", "edge": "RISING"}]}]})
+        await hass.async_block_till_done()
+        assert hass.data["rpi_gpio"].diagnostics()["chips"][chip.path]["ports"] == [5, 6]
+
+        chip.set_input(5, False)
+        await async_wait_for(lambda: state(hass, "binary_sensor.polled") == "off")
+        chip.set_input(5, True)
+        await async_wait_for(lambda: state(hass, "binary_sensor.polled") == "on")
+
+        # only the configured edge is counted
+        for _ in range(10):
+            chip.set_input(6, True)
+            await asyncio.sleep(0.04)
+            chip.set_input(6, False)
+            await asyncio.sleep(0.04)
+        # a full update_interval after the last edge
+        await asyncio.sleep(1.1)
+        assert state(hass, "sensor.count") == "10"
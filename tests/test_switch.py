@@ -0,0 +1,122 @@
+"""Switches and switch groups on a simulated chip."""
+import errno
+
+from homeassistant.exceptions import HomeAssistantError
+import pytest
+
+from custom_components.rpi_gpio.sim import SimChip
+
+from .common import async_wait_for, sim_chip, state, track_states
+
+
+async def test_outputs_share_one_request(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio", "switches": [
+            {"name": "r1", "port": 22}, {"name": "r2", "port": 23}, {"name": "r3", "port": "GPIO24"}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        request = chip._lines[22].request
+        assert request is not None
+        assert sorted(request.offsets) == [22, 23, 24]
+        assert chip.get_line_info(24).consumer == "rpi_gpio"
+
+
+async def test_group_switches_members_at_once(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio",
+                    "switches": [{"name": "r1", "port": 22}, {"name": "r2", "port": "GPIO23", "chip": "gpiochip0"}],
+                    "groups": [{"name": "g", "members": [22, {"port": 23, "chip": "/dev/gpiochip0"}]},
+                               {"name": "bad", "members": [22, 24]}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.g"}, blocking=True)
+        assert (chip.level(22), chip.level(23)) == (True, True)
+        assert state(hass, "switch.r1") == state(hass, "switch.r2") == "on"
+        await hass.services.async_call("switch", "turn_off", {"entity_id": "switch.g"}, blocking=True)
+        assert (chip.level(22), chip.level(23)) == (False, False)
+        # 24 is no switch of the platform
+        assert state(hass, "switch.bad") is None
+
+
+async def test_set_outputs(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio", "switches": [{"name": "r1", "port": 22}, {"name": "r2", "port": 23}]}],
+    }) as hass:
+        chip = sim_chip(hass)
+        await hass.services.async_call("rpi_gpio", "set_outputs", {"outputs": {22: True, "GPIO23": True}}, blocking=True)
+        assert (chip.level(22), chip.level(23)) == (True, True)
+        assert state(hass, "switch.r2") == "on"
+
+
+async def test_momentary_switch(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [
+            {"platform": "rpi_gpio", "switches": [{"name": "gate", "port": 22, "momentary": True, "pulse_time": 0.05}]},
+            {"platform": "rpi_gpio", "switches": [{"name": "zero", "port": 23, "momentary": True, "pulse_time": 0}]},
+        ],
+    }) as hass:
+        chip = sim_chip(hass)
+        states = track_states(hass, "switch.gate")
+        await hass.services.async_call("switch", "turn_on", {"entity_id": "switch.gate"}, blocking=True)
+        assert not chip.level(22)
+        await async_wait_for(lambda: states == ["on", "off"])
+        # a zero pulse time is rejected instead of turning momentary off
+        assert state(hass, "switch.zero") is None
+
+
+async def test_set_outputs_partial_failure(start):
+    async with start({
+        "rpi_gpio": {"simulator": True},
+        "switch": [
+            {"platform": "rpi_gpio", "switches": [{"name": "r1", "port": 22}]},
+            {"platform": "rpi_gpio", "switches": [{"name": "r2", "port": 23}]},
+        ],
+    }) as hass:
+        chip = sim_chip(hass)
+        request = chip._lines[23].request
+        assert request is not chip._lines[22].request
+
+        def busy(values):
+            raise OSError(errno.EBUSY, "busy")
+
+        request.set_values = busy
+        with pytest.raises(HomeAssistantError):
+            await hass.services.async_call("rpi_gpio", "set_outputs", {"outputs": {22: True, 23: True}}, blocking=True)
+        # the request that was driven shows its new state
+        assert chip.level(22)
+        assert state(hass, "switch.r1") == "on"
+        assert state(hass, "switch.r2") == "off"
+
+
+async def test_persistent_switches_restored(start, monkeypatch):
+    config = {
+        "rpi_gpio": {"simulator": True},
+        "switch": [{"platform": "rpi_gpio", "switches": [
+            {"name": "kept", "port": 22, "persistent": True},
+            {"name": "kept off", "port": 23, "persistent": True},
+            {"name": "plain", "port": 24}]}],
+    }
+    async with start(config) as hass:
+        for entity_id in ("switch.kept", "switch.plain"):
+            await hass.services.async_call("switch", "turn_on", {"entity_id": entity_id}, blocking=True)
+    # the states are saved when Home Assistant stops, record what the next start writes
+    writes = []
+    original = SimChip._set
+
+    def record(chip, request, values):
+        writes.append(dict(values))
+        original(chip, request, values)
+
+    monkeypatch.setattr(SimChip, "_set", record)
+    async with start(config) as hass:
+        chip = sim_chip(hass)
+        # requested with the restored level, no write follows the request
+        assert chip.level(22) and not chip.level(23) and not chip.level(24)
+        assert writes == []
+        assert chip._lines[22].request is chip._lines[24].request
+        assert state(hass, "switch.kept") == "on"
+        assert state(hass, "switch.kept_off") == state(hass, "switch.plain") == "off"